@@ -1,16 +1,14 @@
 ### Importando módulos:
-import numpy as np
+import time
+
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
-import plotly.subplots as sp
 import text as txt
-from PIL import Image
-from re import match
+import assets
+import diagnostics
+from refresher import Refresher
+from config import SISANT_URL
 from streamlit_extras.metric_cards import style_metric_cards
-from wordcloud import WordCloud
 
 #Styling & useful settings
 pd.options.mode.chained_assignment = None
@@ -18,8 +16,6 @@ st.set_page_config(page_title="ANAC UAV Database")
 style_metric_cards(
     background_color=None, border_color="#cccccc", border_left_color="#cccccc"
 )
-title_font = dict(color="rgb(150,150,150)", family="Roboto", size=24)
-
 
 
 # loading CSS style
@@ -55,9 +51,7 @@ st.header(
 
 left_co, cent_co, right_co = st.columns([0.2, 0.6, 0.2])
 with cent_co:
-    img = Image.open("img/drone.jpg")
-    new_img = img.resize((int(img.width * 0.05), int(img.height * 0.05)))
-    st.image(new_img)
+    st.image(assets.image("drone.jpg"))
 
 st.markdown(txt.INTRO1.get(lang))
  
@@ -66,40 +60,32 @@ st.markdown(txt.INTRO2.get(lang))
 st.markdown(txt.INTRO3.get(lang))
 
 # loading data, dropping NAs and renaming features
-@st.cache_resource(ttl="3d")
-def download_data(url):
-    df = pd.read_csv(
-        url,
-        delimiter=";",
-        skiprows=1,
-        parse_dates=["DATA_VALIDADE"],
-        #date_parser=lambda x: pd.to_datetime(x, format=r"%d/%m/%Y"),
-        date_format="%d/%m/%Y"
-    )
-    return df
+# (the pipeline is shared by every session and rerun, and computes each stage once per data version;
+# a background thread checks the source and swaps in new versions, so no rerun waits for the download)
+@st.cache_resource
+def data_refresher(url):
+    refresher = Refresher(url)
+    refresher.current()
+    return refresher.start()
 
 try:
-    url = r"https://sistemas.anac.gov.br/dadosabertos/Aeronaves/drones%20cadastrados/SISANT.csv"
-    
-    df = download_data(url)
+    refresher = data_refresher(SISANT_URL)
+    data = refresher.current()
 
 except Exception as e:
     st.error(f"The data could not be downloaded. Error: {e}")
+    st.stop()
 
-df.dropna(inplace=True)
+refresh = refresher.status()
+st.sidebar.caption(
+    txt.SB_REFRESH.get(lang).format(
+        last=time.strftime("%Y-%m-%d %H:%M", time.localtime(refresh["last_refresh"])),
+        interval=f"{refresh['interval'] / 3600:g}",
+    )
+    + (" ⟳" if refresh["refreshing"] else "")
+)
 
-df.columns = [
-    "AIRCRAFT_ID",
-    "EXPIRATION_DATE",
-    "OPERATOR",
-    "CPF_CNPJ",
-    "TYPE_OF_USE",
-    "MANUFACTURER",
-    "MODEL",
-    "SERIAL_NUMBER",
-    "MAX_WEIGHT_TAKEOFF",
-    "TYPE_OF_ACTIVITY",
-]
+df = data["raw"]
 
 st.info(
     txt.INFO.get(lang),
@@ -109,12 +95,7 @@ st.info(
 st.write(txt.BLT_FEATURES.get(lang))
 
 with st.container():
-    import io
-
-    buffer = io.StringIO()
-    df.info(buf=buffer)
-    info_string = buffer.getvalue()
-    st.code(info_string)
+    st.code(data["raw_info"])
 
 st.dataframe(df, height=250, use_container_width=True)
 
@@ -168,7 +149,7 @@ st.subheader("Dataframe metadata:")
 
 left_co, cent_co, right_co = st.columns([0.1, 0.8, 0.1])
 with cent_co:
-    img = Image.open("img/features.jpg")
+    img = assets.image("features.jpg")
     # new_img = img.resize(
     #     (
     #         int(img.width * 0.05),
@@ -183,40 +164,32 @@ st.subheader("Data pre-processing")
 
 left_co, cent_co, right_co = st.columns([0.1, 0.8, 0.1])
 with cent_co:
-    img = Image.open("img/aerial_farm.jpg")
+    img = assets.image("aerial_farm.jpg")
     st.image(img)
 
 st.markdown(txt.DPP_MD1.get(lang))
 
-# checking the duplicates
-dupl = df[df.duplicated(subset=["AIRCRAFT_ID"], keep=False)]
-
-# removing whitespaces
-df["AIRCRAFT_ID"] = df["AIRCRAFT_ID"].str.replace(" ", "")
-
-# removing duplicates
-df = df.drop_duplicates(subset=["AIRCRAFT_ID"], keep="last")
+# the cleaned dataframe comes from the snapshot, so the pre-processing steps are not repeated on every rerun;
+# the view with the ID codes and 'REG_DATE' is shared by all sessions, each one getting a copy-on-write reference
+df = data["clean_view"]
 
-# check if the ID codes for each aircraft comply to the patterns set in the metadata, and removing those that do not.
-nrows_before = df.shape[0]
-
-pattern = r"^(PR|PP|PS)-\d{9}$"
-mask = [bool(match(pattern, code)) for code in df["AIRCRAFT_ID"]]
-df = df[mask]
-
-nrows_after = df.shape[0]
+reasons = ", ".join(
+    f"{reason}: {count}"
+    for reason, count in data.stats.get("invalid_reasons", {}).items()
+    if count
+)
 
 st.markdown(
-    f""":x: Duplicated entries: {dupl.shape[0]}    
-:x: Invalid ID entries: **{nrows_before - nrows_after}**    
-:heavy_check_mark: Valid entries in the dataframe: **{nrows_after}**"""
+    f""":x: Duplicated entries: {data.stats["duplicated"]}    
+:x: Invalid ID entries: **{data.stats["invalid"]}**{f" ({reasons})" if reasons else ""}    
+:heavy_check_mark: Valid entries in the dataframe: **{data.stats["valid"]}**"""
 )
 
-# setting index:
-df = df.set_index(df["AIRCRAFT_ID"])
-df = df.drop(("AIRCRAFT_ID"), axis=1)
-
-st.dataframe(df, height=250, use_container_width=True)
+st.dataframe(
+    df.drop(["STATUS", "REG_DATE", "LEGAL_ENT", "ENT_NUM", "ENT_CHECK"], axis=1),
+    height=250,
+    use_container_width=True,
+)
 
 with st.expander(txt.CHECK_CODE.get(lang)):
     st.code("""
@@ -226,10 +199,21 @@ with st.expander(txt.CHECK_CODE.get(lang)):
     #removing duplicates
     df = df.drop_duplicates(subset=['AIRCRAFT_ID'], keep='last')
 
-    #ensuring that all ID codes comply to the patterns set in the metadata
-    pattern = r'^(PR|PP|PS)-\d{9}$'
-    mask = [bool(match(pattern, code)) for code in df['AIRCRAFT_ID']]
-    df = df[mask]
+    #checking the ID codes against the pattern ^(PR|PP|PS)-\\d{9}$ with columnar string operations,
+    #returning the code of the first problem found in each one
+    ID_PROBLEMS = ['valid', 'wrong prefix', 'wrong length', 'non-digit characters']
+
+    def id_problems(ids):
+        prefix = ids.str[:3].isin(['PR-', 'PP-', 'PS-']).to_numpy(dtype=bool)
+        length = (ids.str.len() == 12).to_numpy(dtype=bool)
+        number = ids.str[3:]
+        digits = (number.str.isdecimal() & number.str.isascii()).to_numpy(dtype=bool)
+        return np.select([~prefix, ~length, ~digits], [1, 2, 3], 0).astype(np.int8)
+
+    #counting the invalid ID codes by reason, and keeping only the valid ones
+    problems = id_problems(df['AIRCRAFT_ID'])
+    invalid_reasons = dict(zip(ID_PROBLEMS[1:], np.bincount(problems, minlength=4)[1:]))
+    df = df[problems == 0]
 
     #setting index
     df = df.set_index(df['AIRCRAFT_ID'])
@@ -237,228 +221,83 @@ with st.expander(txt.CHECK_CODE.get(lang)):
 
 st.markdown(txt.DPP_MD2.get(lang))
 
-# creating a function that sorts dates according to register status (register ok, renew ou inactive)
-def reg_status(date):
-    today = pd.Timestamp.today()
-    if date < today:
-        return "renew"
-    elif date < today - pd.DateOffset(months=6):
-        return "inactive"
-    else:
-        return "ok"
-
-
-# creating a 'STATUS' feature, containing categorized data about each aircraft
-df["STATUS"] = df["EXPIRATION_DATE"].apply(reg_status)
-df["STATUS"] = df["STATUS"].astype("category")
-
-# creating feature 'REG_DATE'
-df["REG_DATE"] = df["EXPIRATION_DATE"] - pd.DateOffset(years=2)
-
-# st.write(df[['STATUS', 'REG_DATE']])
-
-# st.markdown(
-# '''Following, the `CPF_CNPJ` feature was worked on.'''
-# )
-
-# with st.expander(txt.CHECK_CODE.get(lang):
-#     st.code(
-#     '''#removing whitespaces from the 'CPF_CNPJ'
-#     df['CPF_CNPJ'] = df['CPF_CNPJ'].str.replace(" ", "")'''
-#     )
-
-# removing whitespaces from the 'CPF_CNPJ'
-df["CPF_CNPJ"] = df["CPF_CNPJ"].str.replace(" ", "")
-
 st.markdown(txt.DPP_MD3.get(lang))
 
-# st.write(df['CPF_CNPJ'])
-
-# with st.expander(txt.CHECK_CODE.get(lang):
-#     st.code(
-#     '''df['LEGAL_ENT'] = df['CPF_CNPJ'].apply(
-#         lambda x: 'individual' if x.startswith('CPF') else 'company'
-#         ).astype('category')
-
-#     df['ENT_NUM'] = df['CPF_CNPJ'].apply(
-#         lambda x: ''.join(filter(str.isdigit, x.replace(':', '')))
-#         ).astype('category')
-
-#     #dropping CPF_CNPJ
-#     df = df.drop(('CPF_CNPJ'), axis=1)'''
-#     )
-
-# Splitting the 'CPF_CNPJ' feature into 'LEGAL_ENT' and 'ENT_NUM'
-df["LEGAL_ENT"] = (
-    df["CPF_CNPJ"]
-    .apply(lambda x: "individual" if x.startswith("CPF") else "company")
-    .astype("category")
-)
+# st.write(df[['LEGAL_ENT', 'ENT_NUM']])
+st.write(df[["STATUS", "REG_DATE", "LEGAL_ENT", "ENT_NUM", "ENT_CHECK"]])
 
-df["ENT_NUM"] = (
-    df["CPF_CNPJ"]
-    .apply(lambda x: "".join(filter(str.isdigit, x.replace(":", ""))))
-    .astype("category")
+checks = data.stats.get("ent_check", {})
+st.markdown(
+    f""":heavy_check_mark: CPF/CNPJ numbers with valid check digits: **{checks.get("valid", 0)}**    
+:x: CPF/CNPJ numbers with invalid check digits: {checks.get("invalid", 0)}    
+:grey_question: CPF numbers in suppressed form (not verifiable): {checks.get("masked", 0)}"""
 )
 
-# dropping CPF_CNPJ
-df = df.drop(("CPF_CNPJ"), axis=1)
-
-# st.write(df[['LEGAL_ENT', 'ENT_NUM']])
-st.write(df[["STATUS", "REG_DATE", "LEGAL_ENT", "ENT_NUM"]])
-
 with st.expander(txt.CHECK_CODE.get(lang)):
     st.code(
         """#function that sorts dates according to register status
-def reg_status(date):
-    today = pd.Timestamp.today()
-    if date < today:
-        return 'renew'
-    elif date < today - pd.DateOffset(months=6):
-        return 'inactive'
-    else:
-        return 'ok'
+def reg_status(dates, as_of=None):
+    as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+    dates = dates.to_numpy()
+    status = np.select(
+        [dates < (as_of - pd.DateOffset(months=6)).to_datetime64(), dates < as_of.to_datetime64()],
+        [0, 2],
+        1,
+    )
+    return pd.Categorical.from_codes(status, ['inactive', 'ok', 'renew'])
 
 #creating a 'STATUS' feature, containing categorized data about each aircraft
-df['STATUS'] = df['EXPIRATION_DATE'].apply(reg_status)
-df['STATUS'] = df['STATUS'].astype('category')
+df['STATUS'] = reg_status(df['EXPIRATION_DATE'])
 
 #creating feature 'REG_DATE'
 df['REG_DATE'] = df['EXPIRATION_DATE'] - pd.DateOffset(years=2)
 
-#removing whitespaces from the 'CPF_CNPJ'
-df['CPF_CNPJ'] = df['CPF_CNPJ'].str.replace(" ", "")
-
-#splitting the 'CPF_CNPJ' feature into 'LEGAL_ENT' and 'ENT_NUM'
-df['LEGAL_ENT'] = df['CPF_CNPJ'].apply(
-    lambda x: 'individual' if x.startswith('CPF') else 'company'
-    ).astype('category')
+#checking the two mod-11 check digits of each number (numbers of a single repeated digit pass it, but are not issued)
+def check_digits(numbers, weights):
+    width = len(weights[1]) + 1
+    digits = numbers[:, None] // 10 ** np.arange(width - 1, -1, -1) % 10
+    valid = ~(digits == digits[:, :1]).all(axis=1)
+    for w in weights:
+        remainder = (digits[:, : len(w)] * w).sum(axis=1) % 11
+        valid &= digits[:, len(w)] == np.where(remainder < 2, 0, 11 - remainder)
+    return valid
 
-df['ENT_NUM'] = df['CPF_CNPJ'].apply(
-    lambda x: ''.join(filter(str.isdigit, x.replace(':', '')))
-    ).astype('category')
+#removing whitespaces from the 'CPF_CNPJ'
+cpf_cnpj = df['CPF_CNPJ'].str.replace(" ", "")
+
+#splitting the 'CPF_CNPJ' feature into 'LEGAL_ENT' and 'ENT_NUM' (an integer key)
+individual = cpf_cnpj.str.startswith('CPF').to_numpy(dtype=bool)
+df['LEGAL_ENT'] = pd.Categorical.from_codes(individual.astype(np.int8), ['company', 'individual'])
+
+#removing the prefixes and punctuation as plain substrings, only the values in other formats go through a regex
+digits = cpf_cnpj
+for mark in ['CNPJ:', 'CPF:', '.', '-', '/', '*']:
+    digits = digits.str.replace(mark, '', regex=False)
+unusual = ~(digits.str.isdecimal() & digits.str.isascii()) & (digits != '')
+if unusual.any():
+    digits = digits.mask(unusual, digits[unusual].str.replace(r'\\D', '', regex=True))
+
+n_digits = digits.str.len().to_numpy()
+df['ENT_NUM'] = digits.where((n_digits > 0) & (n_digits <= 18)).astype('Int64')
+
+#checking the mod-11 check digits of the CPF and CNPJ numbers
+values = df['ENT_NUM'].fillna(0).to_numpy(dtype=np.int64)
+valid = np.where(
+    individual,
+    (n_digits == 11) & check_digits(values, CPF_WEIGHTS),
+    (n_digits == 14) & check_digits(values, CNPJ_WEIGHTS),
+    )
+masked = cpf_cnpj.str.contains('*', regex=False).to_numpy(dtype=bool)
+df['ENT_CHECK'] = pd.Categorical.from_codes(
+    np.select([masked, valid], [1, 2], 0), ['invalid', 'masked', 'valid']
+    )
 
 #dropping CPF_CNPJ
 df = df.drop(('CPF_CNPJ'), axis=1)"""
     )
 
-# converting dtype
-df["TYPE_OF_USE"] = (
-    df["TYPE_OF_USE"]
-    .apply(lambda x: "basic" if x == "Básico" else "advanced")
-    .astype("category")
-)
-# df['TYPE_OF_USE'] = df['TYPE_OF_USE'].astype('category')
-
-
 st.markdown(txt.DPP_MD4.get(lang))
 
-# creating function so that, given a dataframe column and a map, the names are replaced by standardized names
-def fix_names(column, namemap, df=df):
-    for fixed_name, bad_names in namemap.items():
-        df.loc[df[column].str.contains(bad_names, regex=True), column] = fixed_name
-
-
-df["MANUFACTURER"] = df["MANUFACTURER"].str.lower()
-df["MANUFACTURER"] = df["MANUFACTURER"].str.replace(" ", "")
-
-# the dictionary was created based on the most common values, however, given the high amount of unique values, lesser expressed and unknown manufacturers were grouped in the 'others' category
-man_map = {
-    "autelrobotics": "autel",
-    "c-fly": "cfly|c-fly",
-    "custom": "fabrica|aeromodelo|propria|própria|proprio|próprio|caseiro|montado|artesanal|constru",
-    "dji": "dji|mavic|phanton|phantom",
-    "flyingcircus": "circus",
-    "geprc": "gepr",
-    "highgreat": "highgreat",
-    "horus": "horus",
-    "hubsan": "hubsan|hubsen",
-    "lumasky": "lumasky",
-    "kfplan": "kfp",
-    "nuvemuav": "nuvem",
-    "others": "outro",
-    "parrot": "parrot",
-    "phoenixmodel": "phoenix",
-    "santiago-cintra": "santiago|cintra",
-    "sensefly": "sensefly",
-    "speedbird-aero": "speedbird",
-    "crostars": "crostar",
-    "shantou": "shantou",
-    "sjrc": "sjrc|srjc",
-    "visuo": "visuo",
-    "x-fly": "xfly|x-fly",
-    "xiaomi": "xiaomi|fimi|xiomi",
-    "xmobots": "xmobots",
-    "zll": "zll|sg906",
-}
-
-# transforming the feature with the manufacturers' names
-fix_names("MANUFACTURER", man_map)
-
-df["MANUFACTURER"] = df["MANUFACTURER"].astype("category")
-
-# st.write(
-# '''Finally, the `TYPE_OF_ACTIVITY` feature was also validated and transformed. It categorizes the drones into 'Recreational', 'Experimental', and 'Other activities', the latter category being specified in text provided by the user.'''
-# )
-
-# with st.expander(txt.CHECK_CODE.get(lang):
-#     st.code(
-#     '''#cleaning feature
-#     df['TYPE_OF_ACTIVITY'] = df['TYPE_OF_ACTIVITY'].str.replace(" ", "")
-#     df['TYPE_OF_ACTIVITY'] = df['TYPE_OF_ACTIVITY'].str.lower()
-
-#     #again transforming the values of the feature
-#     act_map = {
-#         'education': 'treinamento|educa|ensin|pesquis',
-#         'engineering': 'pulveriz|aeroagr|agricultura|levantamento|fotograme|prospec|topografia|minera|capta|avalia|mapea|geoproc|engenharia|energia|solar|ambiental|constru|obras|industria|arquitetura|meioambiente',
-#         'photo&film': 'fotografia|cinema|inspe|vídeo|video|fotos|jornal|filma|maker|audit|monit|perícia|audiovisu|vistoria|imagens|turismo|youtube|imobili|imóveis',
-#         'logistics': 'transport|carga|delivery',
-#         'publicity': 'publicid|letreir|show|marketing|demonstr|eventos|comercial',
-#         'safety': 'seguran|fiscaliza|reporta|vigi|policia|bombeiro|defesa|combate|emergencia|infraestrutura'
-#         }
-
-#     #reclassifying more specific activities into 'other' and converting the feature dtype
-#     fix_names('TYPE_OF_ACTIVITY', act_map, df)
-
-#     df.loc[
-#         ~df['TYPE_OF_ACTIVITY'].isin(
-#             df['TYPE_OF_ACTIVITY'].value_counts().head(8).index
-#             ), 'TYPE_OF_ACTIVITY'
-#         ] = 'others'
-
-#     df['TYPE_OF_ACTIVITY'] = df['TYPE_OF_ACTIVITY'].astype('category')'''
-#     )
-
-# cleaning feature
-df["TYPE_OF_ACTIVITY"] = df["TYPE_OF_ACTIVITY"].str.replace(" ", "")
-df["TYPE_OF_ACTIVITY"] = df["TYPE_OF_ACTIVITY"].str.lower()
-
-# again transforming the values of the feature
-act_map = {
-    "education": "treinamento|educa|ensin|pesquis",
-    "engineering": "pulveriz|aeroagr|agricultura|levantamento|fotograme|prospec|topografia|minera|capta|avalia|mapea|geoproc|engenharia|energia|solar|ambiental|constru|obras|industria|arquitetura|meioambiente",
-    "photo&film": "fotografia|cinema|inspe|vídeo|video|fotos|jornal|filma|maker|audit|monit|perícia|audiovisu|vistoria|imagens|turismo|youtube|imobili|imóveis",
-    "logistics": "transport|carga|delivery",
-    "publicity": "publicid|letreir|show|marketing|demonstr|eventos|comercial",
-    "recreative": "recreativo",
-    "safety": "seguran|fiscaliza|reporta|vigi|policia|bombeiro|defesa|combate|emergencia|infraestrutura",
-}
-
-# reclassifying more specific activities into 'other' and converting the feature dtype
-fix_names("TYPE_OF_ACTIVITY", act_map, df)
-
-df.loc[
-    ~df["TYPE_OF_ACTIVITY"].isin(df["TYPE_OF_ACTIVITY"].value_counts().head(8).index),
-    "TYPE_OF_ACTIVITY",
-] = "others"
-
-df["TYPE_OF_ACTIVITY"] = df["TYPE_OF_ACTIVITY"].astype("category")
-df["OPERATOR"] = df["OPERATOR"].astype("string")
-df["MODEL"] = df["MODEL"].astype("string")
-
-# dropping features that won't be used
-df = df.drop(["SERIAL_NUMBER", "MAX_WEIGHT_TAKEOFF"], axis=1)
-
 # st.markdown(
 # 'Lastly, features that would not be used in the analysis were removed from the dataframe.'
 # )
@@ -474,25 +313,42 @@ df = df.drop(["SERIAL_NUMBER", "MAX_WEIGHT_TAKEOFF"], axis=1)
 st.markdown(txt.BLT_DDF.get(lang))
 
 with st.container():
-    import io
-
-    buffer = io.StringIO()
-    df.info(buf=buffer)
-    info_string = buffer.getvalue()
-    st.code(info_string)
+    st.code(data["clean_info"])
 
 st.write(df)
 
 with st.expander(txt.CHECK_CODE.get(lang)):
     st.code(
-        """#creating function for fixing the names based on a map
+        """#compiling a map into a single regex, with one alternative per standardized name tried in the order of the map,
+#so one match tells which entry of the map catches the value first
+def compile_names(namemap):
+    items = list(namemap.items())
+    alternatives = '|'.join(
+        f'(?=.*?(?:{bad_names}))(?P<n{i}>)' for i, (_, bad_names) in enumerate(items)
+        )
+    regex = re.compile(f'^(?:{alternatives})', re.DOTALL)
+
+    #each entry resolves to the name it would end up with if the map was applied entry by entry
+    resolved = []
+    for i, (fixed_name, _) in enumerate(items):
+        for later_name, later_names in items[i + 1:]:
+            if re.search(later_names, fixed_name):
+                fixed_name = later_name
+        resolved.append(fixed_name)
+
+    def classify(value):
+        m = regex.match(value)
+        return resolved[int(m.lastgroup[1:])] if m else value
+
+    return classify
+
+#creating function for fixing the names based on a map: each distinct raw name is standardized once
+#(setting lowercase and removing whitespaces) and the result is mapped back to the rows
 def fix_names(column, namemap, df=df):
-    for fixed_name, bad_names in namemap.items():
-        df.loc[df[column].str.contains(bad_names, regex=True), column] = fixed_name
-        
-#setting lowercase and removing whitespaces
-df['MANUFACTURER'] = df['MANUFACTURER'].str.lower()
-df['MANUFACTURER'] = df['MANUFACTURER'].str.replace(" ", "")
+    classify = compile_names(namemap)
+    names = df[column].astype('category')
+    lookup = {name: classify(name.lower().replace(" ", "")) for name in names.cat.categories}
+    df[column] = names.map(lookup).astype('category')
 
 #the following map was created based on the most common values
 man_map = {
@@ -523,13 +379,7 @@ man_map = {
 #transforming the feature with the manufacturers names
 fix_names('MANUFACTURER', man_map)
 
-df['MANUFACTURER'] = df['MANUFACTURER'].astype('category')
-
-#now its time to fix the 'TYPE_OF_ACTIVITY'
-df['TYPE_OF_ACTIVITY'] = df['TYPE_OF_ACTIVITY'].str.replace(" ", "")
-df['TYPE_OF_ACTIVITY'] = df['TYPE_OF_ACTIVITY'].str.lower()
-
-#again transforming the values of the feature based on a map
+#now its time to fix the 'TYPE_OF_ACTIVITY', again transforming the values of the feature based on a map
 act_map = {
     'education': 'treinamento|educa|ensin|pesquis',
     'engineering': 'pulveriz|aeroagr|agricultura|levantamento|fotograme|prospec|topografia|minera|capta|avalia|mapea|geoproc|engenharia|energia|solar|ambiental|constru|obras|industria|arquitetura|meioambiente',    
@@ -564,7 +414,7 @@ st.subheader(txt.EX_SUBHEADER.get(lang))
 
 left_co, cent_co, right_co = st.columns([0.1, 0.8, 0.1])
 with cent_co:
-    img = Image.open("img/aerial_roof.jpg")
+    img = assets.image("aerial_roof.jpg")
     # new_img = img.resize(
     #     (
     #         int(img.width * 0.05),
@@ -575,45 +425,21 @@ with cent_co:
 
 st.markdown(txt.EX_MD1.get(lang))
 
-# aggregating data by month
-agg_data = df.resample("ME", on="REG_DATE").count()
-agg_data.reset_index(inplace=True)
-
-# creating and displaying line plot
-fig = px.line(
-    agg_data,
-    x="REG_DATE",
-    y="OPERATOR",
-    title=None,
-    labels={"REG_DATE": "", "OPERATOR": "new registers"},
-)
-
-# adding a customized title
-fig.add_annotation(
-    xref="paper",
-    yref="paper",
-    x=0,
-    y=1.1,
-    text="Compliance with the system has increased over the time",
-    showarrow=False,
-    font=title_font,
-)
+st.plotly_chart(data.figure("monthly_registers", lang), use_container_width=True)
 
-st.plotly_chart(fig, use_container_width=True)
+# registration metrics, computed in a single pass over REG_DATE and STATUS
+kpi = data["metrics"]
 
 col1, col2, col3 = st.columns(3)
 with col1:
-    week_data = df.resample("W", on="REG_DATE").count()
     st.metric(
         label="New registers this week:",
-        value=week_data.OPERATOR.iloc[-1],
+        value=kpi.this_week,
     )
 with col2:
-    st.metric(
-        label="Registers last six months:", value=agg_data.OPERATOR.iloc[-7:-1].sum()
-    )
+    st.metric(label="Registers last six months:", value=kpi.last_six_months)
 with col3:
-    st.metric(label="Total registers:", value=df.shape[0])
+    st.metric(label="Total registers:", value=kpi.total)
 
 with st.expander(txt.CHECK_CODE.get(lang)):
     st.code(
@@ -647,80 +473,47 @@ with st.expander(txt.CHECK_CODE.get(lang)):
     #displaying line plot    
     st.plotly_chart(fig)
 
+    #computing the registration metrics in a single pass
+    kpi = metrics.compute(df['REG_DATE'], df['STATUS'])
+
     #displaying metrics cards
     col1, col2, col3 = st.columns(3)
     with col1:
-        week_data = df.resample('W', on='REG_DATE').count()
         st.metric(
             label="New registers this week:",
-            value=week_data.OPERATOR.iloc[-1],
+            value=kpi.this_week,
         )
     with col2:
         st.metric(
             label="Registers last six months:",
-            value=agg_data.OPERATOR.iloc[-7:-1].sum()
+            value=kpi.last_six_months
         )
     with col3:
         st.metric(
             label="Total registers:",
-            value=df.shape[0]
+            value=kpi.total
             )"""
     )
 
-# calculating the number of aircraft in each category
-n_inact = df[df["STATUS"] == "inactive"].shape[0]
-n_renew = df[df["STATUS"] == "renew"].shape[0]
-n_ok = df[df["STATUS"] == "ok"].shape[0]
-
-fig = go.Figure()
-
-# creating the gauge plot
-fig.add_trace(
-    go.Indicator(
-        mode="gauge+number",
-        value=round(n_ok / df.shape[0] * 100, ndigits=1),
-        number=dict(suffix="%"),
-        title=None,
-        gauge=dict(axis=dict(range=[0, 100], ticksuffix="%")),
-    )
-)
-
-# adding a customized title
-fig.add_annotation(
-    xref="paper",
-    yref="paper",
-    x=0,
-    y=1.2,
-    text="Active drones are in the majority",
-    showarrow=False,
-    font=title_font,
-)
-
-st.plotly_chart(fig)
+st.plotly_chart(data.figure("status_gauge", lang))
 
 # creating the card metrics
 col1, col2 = st.columns(2)
 with col1:
-    week_data = df.resample("W", on="REG_DATE").count()
-    st.metric(label="Expiring drone licenses:", value=n_renew)
+    st.metric(label="Expiring drone licenses:", value=kpi.renew)
 with col2:
-    st.metric(label="Expired:", value=n_inact)
+    st.metric(label="Expired:", value=kpi.inactive)
 
 with st.expander(txt.CHECK_CODE.get(lang)):
     st.code(
         """
-        #calculating the number of aircraft in each category
-        n_inact = df[df['STATUS']=='inactive'].shape[0]
-        n_renew = df[df['STATUS']=='renew'].shape[0]
-        n_ok = df[df['STATUS']=='ok'].shape[0]
-
         fig = go.Figure()
 
         #creating the gauge plot
         fig.add_trace(
             go.Indicator(
                 mode = "gauge+number",
-                value = round(n_ok / df.shape[0] * 100, ndigits=1),
+                value = kpi.ok_share,
                 number=dict(
                     suffix="%"
                 ),
@@ -752,64 +545,20 @@ with st.expander(txt.CHECK_CODE.get(lang)):
         #creating the card metrics
         col1, col2 = st.columns(2)
         with col1:
-            week_data = df.resample('W', on='REG_DATE').count()
             st.metric(
                 label="Expiring drone licenses:",
-                value=n_renew
+                value=kpi.renew
             )
         with col2:
             st.metric(
                 label="Expired:",
-                value=n_inact
+                value=kpi.inactive
             )"""
     )
 
 st.markdown(txt.EX_MD2.get(lang))
 
-# calculate the value counts for each type of use
-value_counts = df["TYPE_OF_USE"].value_counts()
-
-# creating an indicator chart
-fig = go.Figure(
-    go.Indicator(
-        mode="number",
-        title=dict(text="Currently,"),
-        value=value_counts.values[0] / value_counts.sum() * 100,
-        number=dict(suffix="%", font=dict(family="Open Sans", size=96)),
-        domain=dict(x=[0, 1], y=[0.6, 1]),
-    )
-)
-
-# adding text to the chart
-fig.add_annotation(
-    xref="paper",
-    yref="paper",
-    xanchor="center",
-    yanchor="middle",
-    x=0.5,
-    y=0.5,
-    text="of the aircrafts are in basic operations<br><span style='color:gray'>(up to 25 kg, operated within line of sight and below 400 ft).</span>",
-    font=dict(color="white", size=20, family="Open Sans"),
-    showarrow=False,
-)
-
-# adding more text to the chart
-fig.add_annotation(
-    xref="paper",
-    yref="paper",
-    xanchor="center",
-    yanchor="middle",
-    x=0.5,
-    y=0.01,
-    text=f"<span style='color:gray'>There are only</span><br><br><span style='font-size:48px'>{value_counts.values[1]}</span><br>UAVs registered for advanced operations.",
-    font=dict(color="white", size=20, family="Open Sans"),
-    showarrow=False,
-)
-
-# setting the chart's background to transparent
-fig.update_layout(dict(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)"))
-
-st.plotly_chart(fig)
+st.plotly_chart(data.figure("use_indicator", lang))
 
 with st.expander(txt.CHECK_CODE.get(lang)):
     st.code(
@@ -877,52 +626,7 @@ with st.expander(txt.CHECK_CODE.get(lang)):
 
 st.markdown(txt.EX_MD3.get(lang))
 
-# create the histogram plot
-fig = px.histogram(
-    df,
-    y="TYPE_OF_ACTIVITY",
-    color="LEGAL_ENT",
-    category_orders={
-        "TYPE_OF_ACTIVITY": df["TYPE_OF_ACTIVITY"].value_counts().iloc[:10].index
-    },
-    height=500,
-)
-
-# setting histogram plot attributes
-fig.update_layout(
-    legend=dict(
-        title=None,
-        xanchor="right",
-        yanchor="bottom",
-        x=0.92,
-        y=0.05,
-    ),
-    xaxis=dict(title=None),
-    yaxis=dict(title=None),
-)
-
-fig.add_annotation(
-    xref="paper",
-    yref="paper",
-    x=0,
-    y=1.15,
-    text="Recreational drones are in the majority",
-    showarrow=False,
-    font=title_font,
-)
-
-fig.add_annotation(
-    xref="paper",
-    yref="paper",
-    x=0,
-    y=1.08,
-    text="and they are the favorite of the individuals.",
-    showarrow=False,
-    font=dict(color="white", size=16, family="Open Sans"),
-)
-
-# displaying plot
-st.plotly_chart(fig)
+st.plotly_chart(data.figure("activity_histogram", lang))
 
 with st.expander(txt.CHECK_CODE.get(lang)):
     st.code(
@@ -972,46 +676,22 @@ with st.expander(txt.CHECK_CODE.get(lang)):
 
 st.markdown(txt.EX_MD4.get(lang))
 
-counts = df["MANUFACTURER"].value_counts()
+counts = data.counts("MANUFACTURER")
 percentages = counts / counts.sum()
 percentages = percentages.apply(lambda x: f"{round(x * 100, 1)}")
 
-# creating figure and axis
-fig, ax = plt.subplots(figsize=(12, 6))
-fig.patch.set_alpha(0.0)
-fig.patch.set_edgecolor('white')
-
-def create_wordcloud(image):
-    mask = Image.open(image)
-    mask = np.array(mask)
-    wordcloud = WordCloud(
-        width=1200,
-        height=600,
-        mask=mask,
-        relative_scaling=0.4,
-        max_words=2000,
-        min_word_length=3,
-        colormap="tab10",
-    ).generate_from_frequencies(
-        df["MANUFACTURER"].value_counts()
-        .drop(labels=["custom", "others"])
-        .to_dict()
-    )
-    return wordcloud
-
-#creating wordcloud
-wordcloud = create_wordcloud("img/brazil_mask.png")
-
-# setting axis attributes
-ax.axis("off")
-ax.imshow(wordcloud, interpolation="bilinear")
+# rendered wordcloud (PNG), cached as long as the manufacturer counts do not change
+wordcloud = data["wordcloud"]
 
 st.markdown(
     f"""<p style="text-align:center"><span style="font-family:Gravitas One,sans-serif"><span style="color:#ffffff"><strong><span style="font-size:32px">{percentages.iloc[0]}% of the registered brazilian drones<br>were provided by {percentages.index[0].upper()}.</span></strong></span><br><span style="color:#dddddd"><span style="font-size:18px"> {percentages.index[1].upper()} ({percentages.iloc[1]}%) and {percentages.index[2].upper()} ({percentages.iloc[2]}%) come next.</span></span><br><span style="color:#999999"><span style="font-size:16px">Each of the other manufacturers are represented by {percentages.iloc[3]}% or less of the registered aircrafts.</span></span></span></p>""",
     unsafe_allow_html=True,
 )
 
-st.pyplot(fig)
+# the (square) mask takes the middle half of the page, as in the former 12x6 figure
+_, col, _ = st.columns([1, 2, 1])
+with col:
+    st.image(wordcloud, width="stretch")
 
 with st.expander(txt.CHECK_CODE.get(lang)):
     st.code(
@@ -1317,65 +997,9 @@ st.info(txt.INFO2.get(lang), icon="🚀")
 #         return 0
 
 
-# Group by MANUFACTURER and use pd.Grouper to group by month, then unstack to pivot the data
-manuf_count = (
-    df.groupby(["MANUFACTURER", pd.Grouper(key="REG_DATE", freq="ME")], observed=False)
-    .size()
-    .unstack(fill_value=0)
-)
+st.plotly_chart(data.figure("manufacturer_timeline", lang))
 
-top10_manuf = df["MANUFACTURER"].value_counts().index[:12].drop(["custom", "others"])
-
-fig = go.Figure()
-
-for act in top10_manuf:
-    fig.add_trace(
-        go.Scatter(
-            x=manuf_count.loc[act].index, y=manuf_count.loc[act], name=act, mode="lines"
-        )
-    )
-
-fig.add_annotation(
-    text="Although DJI UAV always represented a large part of the new <br>registrations in the system, other manufacturers sometimes cause <br> some spikes in the number of registrations.",
-    align="left",
-    xref="paper",
-    yref="paper",
-    x=0,
-    y=1.3,
-    showarrow=False,
-    font=dict(color="rgb(150,150,150)", family="Roboto", size=20),
-)
-
-st.plotly_chart(fig)
-
-# Group by TYPE_OF_ACTIVITY and use pd.Grouper to group by month, then unstack to pivot the data
-act_count = (
-    df.groupby(
-        ["TYPE_OF_ACTIVITY", pd.Grouper(key="REG_DATE", freq="ME")], observed=False
-    )
-    .size()
-    .unstack(fill_value=0)
-)
-
-top10_act = df["TYPE_OF_ACTIVITY"].value_counts().index
-
-fig = go.Figure()
-
-for act in top10_act:
-    fig.add_trace(go.Scatter(x=act_count.loc[act].index, y=act_count.loc[act], name=act, mode="lines"))
-
-fig.add_annotation(
-    text="""Recreation”, “photo & filming”, and “engineering” had the<br>most registrations over time. Recently, there was a surge in<br>UAV registrations for “publicity”""",
-    align="left",
-    xref="paper",
-    yref="paper",
-    x=0,
-    y=1.3,
-    showarrow=False,
-    font=dict(color="rgb(150,150,150)", family="Roboto", size=20),
-)
-
-st.plotly_chart(fig)
+st.plotly_chart(data.figure("activity_timeline", lang))
 
 with st.expander(txt.CHECK_CODE.get(lang)):
     st.code(
@@ -1406,69 +1030,18 @@ fig.add_annotation(
 
 st.plotly_chart(fig)""")
 
-# creating subsets based on LEGAL_ENT
-ind_df = df.loc[df["LEGAL_ENT"] == "individual", "MANUFACTURER"]
-co_df = df.loc[df["LEGAL_ENT"] == "company", "MANUFACTURER"]
-
-# creating figure and subplots
-fig = sp.make_subplots(
-    rows=1, 
-    cols=2, 
-    #subplot_titles=("individuals", "companies"), 
-    shared_yaxes=True
-)
-
-# creating the first histogram plot (individuals)
-fig.add_trace(
-    go.Bar(
-        name="individuals",
-        x=ind_df.value_counts().iloc[:7].index.drop("custom"),
-        y=ind_df.value_counts().iloc[:7],
-        # marker_color="lightskyblue",
-        text=ind_df.value_counts().iloc[:7],
-    ),
-    row=1,
-    col=1,
-)
-
-# creating the second histogram plot (companies)
-fig.add_trace(
-    go.Bar(
-        name="companies",
-        x=co_df.value_counts().iloc[:7].index.drop("others"),
-        y=co_df.value_counts().iloc[:7],
-        # marker_color="lightgreen",
-        text=co_df.value_counts().iloc[:7],
-    ),
-    row=1,
-    col=2,
-)
-
-# updating layout and axis labels
-fig.update_layout(
-    legend=dict(
-        orientation="h",
-        xref="container",
-        xanchor="center",
-        yref="container",
-        yanchor="bottom",
-        x=0.5,
-        y=0,
-    ),
-    yaxis=dict(title=None),
-    yaxis2=dict(title=None),
-)
-
-fig.add_annotation(
-    text="""Distribution of aircraft manufacturer according to<br>the nature of the operators""",
-    align="left",
-    xref="paper",
-    yref="paper",
-    x=0,
-    y=1.3,
-    showarrow=False,
-    font=title_font,
-)
-
-# displaying
-st.plotly_chart(fig)
\ No newline at end of file
+st.plotly_chart(data.figure("manufacturer_by_entity", lang))
+
+# diagnostics panel (SISANT_DIAGNOSTICS=1): latest spans of the download, cleaning, pipeline stages and charts
+if diagnostics.enabled():
+    with st.sidebar.expander("Diagnostics"):
+        st.dataframe(pd.DataFrame(diagnostics.recent()[::-1]), height=300)
+        st.json(
+            {
+                "version": data.version,
+                "stages": data.computed(),
+                "counts": data.counts.info(),
+                "refresh": refresh,
+            }
+        )
+        st.dataframe(data["memory"])
@@ -0,0 +1,34 @@
+### Web-sized images of img/, encoded once per process and shared by all sessions
+import functools
+import io
+import os
+
+from PIL import Image
+
+IMG_DIR = "img"
+
+# images shown smaller than their file, with the scale applied to them
+SCALES = {"drone.jpg": 0.05}
+
+
+# encoded bytes of the image at the given scale; JPEGs are decoded directly at a reduced size (draft),
+# so the large photos are never decoded in full
+@functools.lru_cache(maxsize=None)
+def _encode(path, mtime, scale):
+    if scale == 1:
+        with open(path, "rb") as f:
+            return f.read()
+
+    with Image.open(path) as img:
+        size = (int(img.width * scale), int(img.height * scale))
+        img.draft("RGB", size)
+        thumbnail = img.convert("RGB").resize(size)
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+# the modification time is part of the cache key, so a replaced file is encoded again
+def image(name):
+    path = os.path.join(IMG_DIR, name)
+    return _encode(path, os.path.getmtime(path), SCALES.get(name, 1))
@@ -0,0 +1,253 @@
+### Dataframe backends of the cleaning and aggregation stages: eager pandas, or a lazy polars query
+#
+# both return the same frames (same values, dtypes and categories); the backend is chosen with SISANT_BACKEND.
+# the polars backend is optional (pip install polars): it runs validation, status, CPF/CNPJ split, name
+# normalization and the top-N collapse as one lazy query, which polars optimizes and runs multithreaded
+import importlib.util
+
+import cube as cubes
+import numpy as np
+import pandas as pd
+import preprocessing
+import registry
+from config import BACKEND
+
+
+class PandasBackend:
+    name = "pandas"
+
+    # the cleaned frame and the stats of the raw frame
+    def clean(self, raw, as_of=None, names=None):
+        rows, _, stats = preprocessing.clean_chunks([raw], names=names)
+        return preprocessing.finalize(rows, as_of), stats
+
+    def by_month(self, cube, column):
+        return cubes.by_month(cube, column)
+
+
+# adds the `name` column, whether the digits of the `number` column pass the check; digits and sums are columns of
+# their own, as one nested expression would be expanded (and evaluated again) at every use
+def _check_digits(frame, number, weights, name):
+    import polars as pl
+
+    width = len(weights[1]) + 1
+    digits = [f"{name}_{i}" for i in range(width)]
+    sums = [f"{name}_SUM{j}" for j in range(len(weights))]
+    frame = frame.with_columns(
+        ((pl.col(number) // 10 ** (width - 1 - i)) % 10).alias(digit) for i, digit in enumerate(digits)
+    )
+    frame = frame.with_columns(
+        (pl.sum_horizontal([pl.col(digits[i]) * int(w[i]) for i in range(len(w))]) % 11).alias(total)
+        for w, total in zip(weights, sums)
+    )
+    valid = [
+        pl.col(digits[len(w)]) == pl.when(pl.col(total) < 2).then(0).otherwise(11 - pl.col(total))
+        for w, total in zip(weights, sums)
+    ]
+    # a single repeated digit, as in preprocessing.check_digits
+    valid.append(~pl.all_horizontal([pl.col(digit) == pl.col(digits[0]) for digit in digits[1:]]))
+    return frame.with_columns(pl.all_horizontal(valid).alias(name)).drop(digits + sums)
+
+
+# raw to standardized name of every value of the column (all its categories, like map_unique)
+def _name_map(series, func, lookup):
+    values = series.cat.categories if isinstance(series.dtype, pd.CategoricalDtype) else series.dropna().unique()
+    for value in values:
+        if value not in lookup:
+            lookup[value] = func(value)
+    return {value: lookup[value] for value in values}
+
+
+def _categorical(codes, categories):
+    return pd.Categorical.from_codes(codes, categories).remove_unused_categories()
+
+
+class PolarsBackend:
+    name = "polars"
+
+    def __init__(self):
+        import polars as pl
+
+        self.pl = pl
+
+    # the row stage and finalize of preprocessing, as a single lazy query; the statistics share its scans
+    def clean(self, raw, as_of=None, names=None):
+        pl = self.pl
+        names = {} if names is None else names
+        as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+        maps = {
+            column: _name_map(raw[column], func, names.setdefault(column, {}))
+            for column, func in preprocessing.STANDARDIZE.items()
+        }
+
+        frame = pl.from_pandas(raw[preprocessing.FEATURES]).lazy()
+        frame = frame.with_columns(
+            pl.col(column).cast(pl.String) for column in ["TYPE_OF_USE", "MANUFACTURER", "TYPE_OF_ACTIVITY"]
+        ).drop_nulls()
+        duplicated = frame.select(pl.col("AIRCRAFT_ID").is_duplicated().sum())
+
+        # removing whitespaces and duplicates (the last one is kept, in the order of the file)
+        ids = pl.col("AIRCRAFT_ID")
+        frame = (
+            frame.with_columns(ids.str.replace_all(" ", "", literal=True))
+            .filter(ids.is_last_distinct())
+        )
+        problem = (
+            pl.when(~ids.str.slice(0, 3).is_in(["PR-", "PP-", "PS-"]))
+            .then(1)
+            .when(ids.str.len_chars() != 12)
+            .then(2)
+            .when(~ids.str.slice(3).str.contains(r"^[0-9]+$"))
+            .then(3)
+            .otherwise(0)
+        )
+        frame = frame.with_columns(problem.alias("PROBLEM"))
+        problems = frame.group_by("PROBLEM").agg(pl.len())
+        frame = frame.filter(pl.col("PROBLEM") == 0)
+
+        # splitting 'CPF_CNPJ' and checking its digits
+        cpf_cnpj = pl.col("CPF_CNPJ").str.replace_all(" ", "", literal=True)
+        # the known marks go first, as plain substrings, so the regex has little left to remove
+        digits = cpf_cnpj
+        for mark in preprocessing.CPF_CNPJ_MARKS:
+            digits = digits.str.replace_all(mark, "", literal=True)
+        digits = digits.str.replace_all(r"\D", "")
+        frame = frame.with_columns(cpf_cnpj, digits.str.len_chars().alias("N_DIGITS"), digits.alias("DIGITS"))
+        n_digits = pl.col("N_DIGITS")
+        frame = frame.with_columns(
+            pl.when((n_digits > 0) & (n_digits <= 18)).then(pl.col("DIGITS").cast(pl.Int64)).alias("ENT_NUM")
+        ).with_columns(pl.col("ENT_NUM").fill_null(0).alias("VALUES"))
+        frame = _check_digits(frame, "VALUES", preprocessing.CPF_WEIGHTS, "CPF_VALID")
+        frame = _check_digits(frame, "VALUES", preprocessing.CNPJ_WEIGHTS, "CNPJ_VALID")
+        individual = pl.col("CPF_CNPJ").str.starts_with("CPF")
+        valid = (
+            pl.when(individual)
+            .then((n_digits == 11) & pl.col("CPF_VALID"))
+            .otherwise((n_digits == 14) & pl.col("CNPJ_VALID"))
+        )
+        ent_check = (
+            pl.when(pl.col("CPF_CNPJ").str.contains("*", literal=True)).then(1).when(valid).then(2).otherwise(0)
+        )
+
+        # status on the `as_of` date, as in reg_status
+        dates = pl.col("EXPIRATION_DATE")
+        inactive = (as_of - pd.DateOffset(months=6)).to_pydatetime()
+        status = pl.when(dates < inactive).then(0).when(dates < as_of.to_pydatetime()).then(2).otherwise(1)
+
+        frame = frame.select(
+            pl.when(ids.str.starts_with("PP")).then(0).when(ids.str.starts_with("PR")).then(1).otherwise(2)
+            .cast(pl.Int8)
+            .alias("ID_PREFIX"),
+            ids.str.slice(3).cast(pl.Int32).alias("ID_NUM"),
+            dates,
+            pl.col("OPERATOR"),
+            pl.when(pl.col("TYPE_OF_USE") == "Básico").then(pl.lit("basic")).otherwise(pl.lit("advanced"))
+            .alias("TYPE_OF_USE"),
+            pl.col("MANUFACTURER").replace_strict(maps["MANUFACTURER"], return_dtype=pl.String),
+            pl.col("MODEL"),
+            pl.col("TYPE_OF_ACTIVITY").replace_strict(maps["TYPE_OF_ACTIVITY"], return_dtype=pl.String),
+            status.cast(pl.Int8).alias("STATUS"),
+            individual.cast(pl.Int8).alias("LEGAL_ENT"),
+            pl.col("ENT_NUM"),
+            ent_check.cast(pl.Int8).alias("ENT_CHECK"),
+        )
+
+        # activities out of the top 8 become 'others'; ties are broken by the order of first appearance
+        activities = (
+            frame.with_row_index("ROW")
+            .group_by("TYPE_OF_ACTIVITY")
+            .agg(pl.len().alias("COUNT"), pl.col("ROW").min())
+            .sort(["COUNT", "ROW"], descending=[True, False])
+            .head(8)
+        )
+
+        rows, duplicated, problems, activities = pl.collect_all([frame, duplicated, problems, activities])
+        return self._to_pandas(rows, maps, activities["TYPE_OF_ACTIVITY"].to_list()), self._stats(
+            rows, duplicated.item(), dict(problems.iter_rows())
+        )
+
+    def _to_pandas(self, rows, maps, top):
+        activity = pd.Series(rows["TYPE_OF_ACTIVITY"].to_numpy())
+        collapsed = activity.where(activity.isin(top), "others")
+        categories = sorted(set(top) | ({"others"} if set(maps["TYPE_OF_ACTIVITY"].values()) - set(top) else set()))
+
+        ent_num = rows["ENT_NUM"].to_arrow()
+        df = pd.DataFrame(
+            {
+                "ID_PREFIX": pd.Categorical.from_codes(rows["ID_PREFIX"].to_numpy(), registry.ID_PREFIXES),
+                "ID_NUM": rows["ID_NUM"].to_numpy(),
+                "EXPIRATION_DATE": rows["EXPIRATION_DATE"].to_numpy(),
+                "OPERATOR": registry.dictionary_encode(pd.Series(rows["OPERATOR"].to_arrow(), dtype="str")),
+                "TYPE_OF_USE": pd.Series(rows["TYPE_OF_USE"].to_arrow(), dtype="str").astype("category"),
+                "MANUFACTURER": pd.Series(rows["MANUFACTURER"].to_arrow(), dtype="str").astype("category"),
+                "MODEL": registry.dictionary_encode(pd.Series(rows["MODEL"].to_arrow(), dtype="str")),
+                "TYPE_OF_ACTIVITY": pd.Categorical(collapsed, categories=categories),
+                "STATUS": pd.Categorical.from_codes(rows["STATUS"].to_numpy(), ["inactive", "ok", "renew"]),
+                "LEGAL_ENT": _categorical(rows["LEGAL_ENT"].to_numpy(), ["company", "individual"]),
+                "ENT_NUM": pd.array(ent_num.to_pandas(types_mapper={ent_num.type: pd.Int64Dtype()}.get)),
+                "ENT_CHECK": _categorical(rows["ENT_CHECK"].to_numpy(), ["invalid", "masked", "valid"]),
+            }
+        )
+        return df[preprocessing.CLEAN_COLUMNS]
+
+    def _stats(self, rows, duplicated, problems):
+        checks = np.bincount(rows["ENT_CHECK"].to_numpy(), minlength=3)
+        return {
+            "duplicated": int(duplicated),
+            "invalid": int(sum(count for problem, count in problems.items() if problem)),
+            "invalid_reasons": {
+                reason: int(problems.get(code, 0))
+                for code, reason in enumerate(preprocessing.ID_PROBLEMS)
+                if code
+            },
+            "valid": rows.height,
+            "ent_check": {
+                check: int(count) for check, count in zip(["invalid", "masked", "valid"], checks)
+            },
+        }
+
+    # the pivot of cube.by_month, with the cells summed by polars and placed in a dense matrix
+    def by_month(self, cube, column):
+        pl = self.pl
+        cells = (
+            pl.from_pandas(cube[[column, "MONTH", "COUNT"]])
+            .lazy()
+            .with_columns(pl.col(column).cast(pl.String))
+            .drop_nulls(["MONTH"])
+            .group_by([column, "MONTH"])
+            .agg(pl.col("COUNT").sum())
+            .collect()
+        )
+        categories = cube[column].cat.categories
+        months = cubes.months(cube)
+        matrix = np.zeros((len(categories), len(months)), dtype=np.int64)
+        rows = categories.get_indexer(cells[column].to_numpy())
+        columns = months.get_indexer(cells["MONTH"].to_numpy())
+        keep = (rows >= 0) & (columns >= 0)
+        matrix[rows[keep], columns[keep]] = cells["COUNT"].to_numpy()[keep]
+        index = pd.CategoricalIndex(categories, categories=categories, name=column)
+        return pd.DataFrame(matrix, index=index, columns=months)
+
+
+BACKENDS = {"pandas": PandasBackend, "polars": PolarsBackend}
+
+# optional packages each backend needs
+REQUIRES = {"polars": "polars"}
+
+_instances = {}
+
+
+def available():
+    return [
+        name for name in BACKENDS if name not in REQUIRES or importlib.util.find_spec(REQUIRES[name]) is not None
+    ]
+
+
+def get(name=BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"unknown dataframe backend {name!r}, expected one of {', '.join(BACKENDS)}")
+    if name not in available():
+        raise ImportError(f"the {name!r} backend needs the {REQUIRES[name]} package (pip install {REQUIRES[name]})")
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
@@ -0,0 +1,134 @@
+### Side-by-side benchmark of the dataframe backends on synthetic registries of growing size
+#
+# usage: python benchmarks/dataframes.py [--base ROWS] [--scales 1 10] [--repeat 3] [--out results.json]
+# every available backend cleans the same parsed frame and pivots the same cube; the results are checked to be
+# identical to the pandas ones before any timing is reported
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# nothing of the benchmark is written to the app's snapshots, even if SISANT_SNAPSHOT_DIR is set
+SCRATCH_DIR = tempfile.mkdtemp(prefix="sisant-bench-")
+os.environ["SISANT_SNAPSHOT_DIR"] = SCRATCH_DIR
+atexit.register(shutil.rmtree, SCRATCH_DIR, ignore_errors=True)
+
+import backends
+import cube as cubes
+import ingestion
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from stages import BASE_ROWS, dataset
+
+# the same status date for every backend, so a run across midnight cannot tell them apart
+AS_OF = pd.Timestamp.today().normalize()
+
+
+# best time of `repeat` calls, and the result of the last one
+def best(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def run(path, names, repeat):
+    raw = ingestion.parse_csv(path)
+    results = {}
+    expected = None
+    for name in names:
+        backend = backends.get(name)
+        # a new names lookup per call, so no backend is timed with the names standardized by another one
+        clean_seconds, (clean, stats) = best(lambda: backend.clean(raw, AS_OF, names={}), repeat)
+        cube = cubes.build(clean)
+        pivot_seconds, pivots = best(
+            lambda: [backend.by_month(cube, column) for column in ["MANUFACTURER", "TYPE_OF_ACTIVITY"]], repeat
+        )
+
+        if expected is None:
+            expected = clean, stats, pivots
+        else:
+            pd.testing.assert_frame_equal(clean, expected[0])
+            assert stats == expected[1], f"{name} stats differ from {names[0]}"
+            for pivot, reference in zip(pivots, expected[2]):
+                pd.testing.assert_frame_equal(pivot, reference)
+
+        results[name] = {
+            "clean_seconds": round(clean_seconds, 4),
+            "by_month_seconds": round(pivot_seconds, 4),
+            "rows_in": raw.shape[0],
+            "rows_out": clean.shape[0],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="side-by-side benchmark of the dataframe backends")
+    parser.add_argument("--base", type=int, default=BASE_ROWS, help="rows of the 1x registry")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="calls per backend, the best one is reported")
+    parser.add_argument("--data-dir", default=".bench")
+    parser.add_argument("--out", default=None, help="JSON file for the results (default: stdout)")
+    args = parser.parse_args()
+
+    # pandas first, as the reference the other backends are compared with
+    names = ["pandas"] + [name for name in backends.available() if name != "pandas"]
+    missing = sorted(set(backends.BACKENDS) - set(names))
+    if missing:
+        print(f"skipping {', '.join(missing)} (not installed)", file=sys.stderr)
+
+    environment = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pa.__version__,
+    }
+    if "polars" in names:
+        import polars
+
+        environment["polars"] = polars.__version__
+        environment["polars_threads"] = polars.thread_pool_size()
+
+    report = {
+        "created": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "environment": environment,
+        "base_rows": args.base,
+        "runs": [],
+    }
+    for scale in args.scales:
+        rows = args.base * scale
+        results = run(dataset(args.data_dir, rows, args.seed), names, args.repeat)
+        report["runs"].append({"scale": scale, "rows": rows, "backends": results})
+
+        reference = results["pandas"]
+        for name, result in results.items():
+            speedup = reference["clean_seconds"] / result["clean_seconds"]
+            print(
+                f"{scale:>4}x {name:<8} clean {result['clean_seconds']:>8.3f}s ({speedup:.2f}x) "
+                f"by_month {result['by_month_seconds']:>7.3f}s rows_out={result['rows_out']}",
+                file=sys.stderr,
+            )
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
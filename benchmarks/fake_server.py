@@ -0,0 +1,142 @@
+### Local stand-in for the ANAC server, injecting failures and slow responses to exercise the download layer
+#
+# usage: python benchmarks/fake_server.py FILE [--port 8765] [--fail 2] [--drop 1 --drop-at 0.5] [--delay 1]
+#                                               [--rate 1000000] [--no-gzip] [--no-range]
+# the file is served at any path, with ETag/Last-Modified (and 304 answers), gzip and range requests, e.g.
+#   SISANT_URL=http://127.0.0.1:8765/SISANT.csv streamlit run app.py
+import argparse
+import email.utils
+import gzip
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# request counters shared by the handler threads, for the failures injected only into the first requests
+_counts = {"requests": 0, "bodies": 0}
+_lock = threading.Lock()
+
+
+class Source:
+    def __init__(self, path):
+        self.path = path
+        self._key = None
+
+    # the file is read again whenever it changes on disk, so a test can swap it while the server runs
+    def load(self):
+        stat = os.stat(self.path)
+        key = (stat.st_mtime, stat.st_size)
+        if key != self._key:
+            with open(self.path, "rb") as f:
+                self.body = f.read()
+            self.gzipped = gzip.compress(self.body, compresslevel=6)
+            self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:16]}"'
+            self.last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+            self._key = key
+        return self
+
+
+def handler(source, args):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *params):
+            sys.stderr.write(f"{self.address_string()} {format % params}\n")
+
+        def _count(self, name):
+            with _lock:
+                _counts[name] += 1
+                return _counts[name]
+
+        def do_GET(self):
+            n = self._count("requests")
+            if args.delay:
+                time.sleep(args.delay)
+            if n <= args.fail:
+                self.send_response(503)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            src = source.load()
+            if self.headers.get("If-None-Match") == src.etag or (
+                "If-None-Match" not in self.headers
+                and self.headers.get("If-Modified-Since") == src.last_modified
+            ):
+                self.send_response(304)
+                self.send_header("ETag", src.etag)
+                self.end_headers()
+                return
+
+            body, status, encoding = src.body, 200, None
+            match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+            if_range = self.headers.get("If-Range")
+            if match and not args.no_range and if_range in (None, src.etag, src.last_modified):
+                start = int(match.group(1))
+                if start >= len(body):
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{len(body)}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status, body = 206, body[start:]
+            elif "gzip" in self.headers.get("Accept-Encoding", "") and not args.no_gzip:
+                body, encoding = src.gzipped, "gzip"
+
+            self.send_response(status)
+            self.send_header("Content-Type", "text/csv; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", src.etag)
+            self.send_header("Last-Modified", src.last_modified)
+            self.send_header("Accept-Ranges", "none" if args.no_range else "bytes")
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {len(src.body) - len(body)}-{len(src.body) - 1}/{len(src.body)}")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.end_headers()
+
+            # the first --drop bodies are cut off after --drop-at of their length
+            end = len(body)
+            if self._count("bodies") <= args.drop:
+                end = int(len(body) * args.drop_at)
+            self._send(body[:end])
+            if end < len(body):
+                self.close_connection = True
+
+        def _send(self, body, blocksize=64 * 1024):
+            for start in range(0, len(body), blocksize):
+                block = body[start : start + blocksize]
+                self.wfile.write(block)
+                if args.rate:
+                    time.sleep(len(block) / args.rate)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="local SISANT server with injected failures")
+    parser.add_argument("file", help="CSV file to serve (e.g. made by benchmarks/synthetic.py)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail", type=int, default=0, help="answer the first N requests with 503")
+    parser.add_argument("--drop", type=int, default=0, help="cut off the first N response bodies")
+    parser.add_argument("--drop-at", type=float, default=0.5, help="share of the body sent before the cut")
+    parser.add_argument("--delay", type=float, default=0, help="seconds before answering each request")
+    parser.add_argument("--rate", type=float, default=0, help="bytes per second of the body (0: unlimited)")
+    parser.add_argument("--no-gzip", action="store_true", help="ignore Accept-Encoding")
+    parser.add_argument("--no-range", action="store_true", help="ignore Range requests")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), handler(Source(args.file), args))
+    print(f"serving {args.file} at http://127.0.0.1:{args.port}/SISANT.csv", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
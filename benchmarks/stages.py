@@ -0,0 +1,178 @@
+### Stage-level benchmark of the pipeline on synthetic registries of growing size
+#
+# usage: python benchmarks/stages.py [--base ROWS] [--scales 1 10 100] [--out results.json] [--no-memory]
+# each stage is timed in a first run and memory-profiled (tracemalloc peak) in a second one;
+# the synthetic files are kept in --data-dir and reused by later runs
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# derived frames and renders of the benchmark go to a scratch directory of its own, even if SISANT_SNAPSHOT_DIR
+# is set, as run() empties it
+SCRATCH_DIR = tempfile.mkdtemp(prefix="sisant-bench-")
+os.environ["SISANT_SNAPSHOT_DIR"] = SCRATCH_DIR
+atexit.register(shutil.rmtree, SCRATCH_DIR, ignore_errors=True)
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import figures
+import ingestion
+import preprocessing
+import synthetic
+from pipeline import Pipeline
+
+# rows of the 1x registry, about the size of the current SISANT file
+BASE_ROWS = 120_000
+
+
+def parse(path):
+    return ingestion.parse_csv(path)
+
+
+def validate(raw):
+    df = preprocessing.drop_missing(raw)
+    df["AIRCRAFT_ID"] = df["AIRCRAFT_ID"].str.replace(" ", "")
+    df = df.drop_duplicates(subset=["AIRCRAFT_ID"], keep="last")
+    return preprocessing.validate_ids(df)
+
+
+def status(df):
+    return preprocessing.add_status(df)
+
+
+def normalize(df):
+    return preprocessing.normalize_names(preprocessing.split_cpf_cnpj(df))
+
+
+def aggregate(rows):
+    data = Pipeline(f"bench-{rows.shape[0]}", None, preprocessing.finalize(rows), {})
+    data["cube"]
+    data["metrics"]
+    data["monthly"]
+    for column in ["MANUFACTURER", "TYPE_OF_ACTIVITY", "TYPE_OF_USE"]:
+        data.counts(column)
+    return data
+
+
+def render(data):
+    for name in figures.FIGURES:
+        data.figure(name, "en").to_json()
+    return data
+
+
+def wordcloud(data):
+    data["wordcloud"]
+    return data
+
+
+STAGES = [parse, validate, status, normalize, aggregate, render, wordcloud]
+
+
+def _rows(obj):
+    if isinstance(obj, Pipeline):
+        return obj.clean.shape[0]
+    if isinstance(obj, pd.DataFrame):
+        return obj.shape[0]
+    return None
+
+
+# runs the stages in order, each on the output of the previous one;
+# the scratch directory is emptied first, so the cube and the word cloud are never read back from a previous run
+def run(path, memory=False):
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+    results = []
+    value = path
+    for stage in STAGES:
+        rows_in = _rows(value)
+        arrow_before = pa.total_allocated_bytes()
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        value = stage(value)
+        seconds = time.perf_counter() - start
+        result = {
+            "stage": stage.__name__,
+            "seconds": round(seconds, 4),
+            "rows_in": rows_in,
+            "rows_out": _rows(value),
+        }
+        if memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["peak_mb"] = round(peak / 2**20, 1)
+            result["arrow_mb"] = round((pa.total_allocated_bytes() - arrow_before) / 2**20, 1)
+        results.append(result)
+    return results
+
+
+def dataset(data_dir, rows, seed):
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"SISANT-{rows}-{seed}.csv")
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        synthetic.generate(f"{path}.tmp", rows, seed)
+        os.replace(f"{path}.tmp", path)
+        print(f"generated {path} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="stage-level benchmark of the SISANT pipeline")
+    parser.add_argument("--base", type=int, default=BASE_ROWS, help="rows of the 1x registry")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=".bench")
+    parser.add_argument("--out", default=None, help="JSON file for the results (default: stdout)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    args = parser.parse_args()
+
+    report = {
+        "created": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "pyarrow": pa.__version__,
+        },
+        "base_rows": args.base,
+        "runs": [],
+    }
+    for scale in args.scales:
+        rows = args.base * scale
+        path = dataset(args.data_dir, rows, args.seed)
+        timings = run(path)
+        if not args.no_memory:
+            for timing, traced in zip(timings, run(path, memory=True)):
+                timing.update(peak_mb=traced["peak_mb"], arrow_mb=traced["arrow_mb"])
+        report["runs"].append({"scale": scale, "rows": rows, "stages": timings})
+
+        for timing in timings:
+            memory = f" peak={timing['peak_mb']}MB" if "peak_mb" in timing else ""
+            print(
+                f"{scale:>4}x {timing['stage']:<10} {timing['seconds']:>9.3f}s "
+                f"rows_out={timing['rows_out']}{memory}",
+                file=sys.stderr,
+            )
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
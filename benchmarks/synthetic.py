@@ -0,0 +1,141 @@
+### Synthetic SISANT.csv files, in the formats of the real registry, for benchmarks at any size
+#
+# usage: python benchmarks/synthetic.py ROWS OUT.csv [SEED]
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import preprocessing
+
+HEADER = "CODIGO_AERONAVE;DATA_VALIDADE;OPERADOR;CPF_CNPJ;TIPO_USO;FABRICANTE;MODELO;NUMERO_SERIE;PESO_MAXIMO_DECOLAGEM;RAMO_ATIVIDADE"
+
+# raw spellings found in the registry, with their weights; the maps in preprocessing normalize them
+MANUFACTURERS = {
+    "DJI": 40, "dji": 8, "Dji ": 4, "DJI Mavic": 5, "Mavic Pro": 4, "Phantom 4": 3, "Phanton": 1,
+    "Autel Robotics": 4, "AUTEL": 1, "XIAOMI": 3, "Xiaomi Fimi": 2, "FIMI": 1, "Hubsan": 2,
+    "Parrot": 2, "SJRC": 1, "C-FLY": 1, "cfly": 1, "Flying Circus": 1, "GEPRC": 1, "ZLL": 1,
+    "própria": 3, "Próprio": 2, "Aeromodelo caseiro": 1, "Montado": 1, "Outro": 2, "Syma": 1,
+}
+ACTIVITIES = {
+    "Recreativo": 45, "recreativo ": 5, "Fotografia": 10, "Filmagem de eventos": 4,
+    "Inspeção de linhas": 3, "Pulverização agrícola": 4, "Topografia": 3, "Mapeamento": 3,
+    "Engenharia": 2, "Segurança": 3, "Monitoramento": 2, "Publicidade": 2, "Marketing": 1,
+    "Transporte de carga": 1, "Educação": 2, "Treinamento": 1, "Pesquisa": 1, "Outros": 3,
+}
+
+# share of the rows written with each kind of problem
+WRONG_PREFIX = 0.01
+WRONG_LENGTH = 0.005
+NON_DIGIT = 0.003
+SPACED = 0.005
+DUPLICATED = 0.005
+MISSING = 0.002
+CNPJ = 0.2
+BAD_CHECK = 0.03
+RARE_NAMES = 0.01
+
+
+def _choice(rng, weights, n):
+    names = np.array(list(weights), dtype=object)
+    p = np.array(list(weights.values()), dtype=float)
+    return names[rng.choice(len(names), n, p=p / p.sum())]
+
+
+def _digits(numbers, width):
+    return pd.Series(numbers).astype(str).str.zfill(width)
+
+
+def _aircraft_ids(rng, n):
+    prefix = pd.Series(rng.choice(["PR", "PP", "PS"], n))
+    number = _digits(rng.integers(0, 10**9, n), 9)
+    u = rng.random(n)
+    prefix[u < WRONG_PREFIX] = "PX"
+    number = number.where(~((u >= WRONG_PREFIX) & (u < WRONG_PREFIX + WRONG_LENGTH)), number.str[:8])
+    bad = (u >= WRONG_PREFIX + WRONG_LENGTH) & (u < WRONG_PREFIX + WRONG_LENGTH + NON_DIGIT)
+    number = number.where(~bad, number.str[:8] + "A")
+    spaced = rng.random(n) < SPACED
+    ids = prefix + np.where(spaced, " -", "-") + number
+
+    # some registrations appear twice (the last one is kept)
+    dup = np.flatnonzero(rng.random(n) < DUPLICATED)
+    ids.iloc[dup] = ids.iloc[rng.integers(0, n, dup.size)].to_numpy()
+    return ids
+
+
+# CPFs are published in suppressed form; CNPJs in full, mostly with valid check digits
+def _cpf_cnpj(rng, n):
+    cpf = "CPF: ***." + _digits(rng.integers(0, 10**6, n), 6) + "-**"
+
+    base = rng.integers(0, 10, (n, 12))
+    digits = base
+    for weights in preprocessing.CNPJ_WEIGHTS:
+        remainder = (digits[:, : len(weights)] * weights).sum(axis=1) % 11
+        check = np.where(remainder < 2, 0, 11 - remainder)
+        digits = np.column_stack([digits, check])
+    wrong = rng.random(n) < BAD_CHECK
+    digits[wrong, 13] = (digits[wrong, 13] + 1) % 10
+    number = _digits(digits @ 10 ** np.arange(13, -1, -1, dtype=np.int64), 14)
+    cnpj = (
+        "CNPJ: " + number.str[0:2] + "." + number.str[2:5] + "." + number.str[5:8]
+        + "/" + number.str[8:12] + "-" + number.str[12:14]
+    )
+    return cnpj.where(rng.random(n) < CNPJ, cpf)
+
+
+# registrations grow over time: more recent dates are more likely
+def _expiration_dates(rng, n, as_of):
+    start = pd.Timestamp("2017-01-01")
+    span = (as_of - start).days
+    registered = start + pd.to_timedelta((span * np.sqrt(rng.random(n))).astype(np.int64), unit="D")
+    return (registered + pd.DateOffset(years=2)).strftime("%d/%m/%Y")
+
+
+def _names(rng, weights, n, rare):
+    names = pd.Series(_choice(rng, weights, n))
+    # a long tail of spellings seen only a few times
+    tail = rng.random(n) < RARE_NAMES
+    names[tail] = rare + " " + _digits(rng.integers(0, 300, tail.sum()), 3).to_numpy()
+    return names
+
+
+def chunk(rng, n, start, as_of):
+    df = pd.DataFrame(
+        {
+            "CODIGO_AERONAVE": _aircraft_ids(rng, n),
+            "DATA_VALIDADE": _expiration_dates(rng, n, as_of),
+            "OPERADOR": "OPERADOR " + _digits(np.arange(start, start + n), 8),
+            "CPF_CNPJ": _cpf_cnpj(rng, n),
+            "TIPO_USO": np.where(rng.random(n) < 0.97, "Básico", "Avançado"),
+            "FABRICANTE": _names(rng, MANUFACTURERS, n, "Marca"),
+            "MODELO": "Modelo " + _digits(rng.integers(0, 300, n), 3),
+            "NUMERO_SERIE": "SN" + _digits(rng.integers(0, 10**10, n), 10),
+            "PESO_MAXIMO_DECOLAGEM": np.round(rng.uniform(0.1, 25, n), 2),
+            "RAMO_ATIVIDADE": _names(rng, ACTIVITIES, n, "Atividade"),
+        }
+    )
+    # a few missing values, dropped by the pipeline
+    missing = rng.random(n) < MISSING
+    df.loc[missing, "FABRICANTE"] = None
+    return df
+
+
+# writing the file in chunks, so files of many times the registry size fit in memory
+def generate(path, rows, seed=0, chunksize=1_000_000, as_of=None):
+    rng = np.random.default_rng(seed)
+    as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(f"Atualizado em: {as_of:%d/%m/%Y}\n{HEADER}\n")
+        for start in range(0, rows, chunksize):
+            df = chunk(rng, min(chunksize, rows - start), start, as_of)
+            df.to_csv(f, sep=";", header=False, index=False, lineterminator="\n")
+    return path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit("usage: python benchmarks/synthetic.py ROWS OUT.csv [SEED]")
+    generate(sys.argv[2], int(sys.argv[1]), int(sys.argv[3]) if len(sys.argv) > 3 else 0)
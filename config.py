@@ -0,0 +1,34 @@
+import os
+
+# source of the SISANT data (updated daily by ANAC)
+SISANT_URL = os.environ.get(
+    "SISANT_URL",
+    r"https://sistemas.anac.gov.br/dadosabertos/Aeronaves/drones%20cadastrados/SISANT.csv",
+)
+
+# directory where the parsed and cleaned snapshots are stored between restarts
+SNAPSHOT_DIR = os.environ.get("SISANT_SNAPSHOT_DIR", ".snapshots")
+
+# how long (in seconds) a snapshot is served before the source is checked again
+SNAPSHOT_MAX_AGE = int(os.environ.get("SISANT_SNAPSHOT_MAX_AGE", 3 * 24 * 60 * 60))
+
+# seconds a download may stall before the attempt fails, and the number of retries (with exponential backoff
+# starting at DOWNLOAD_BACKOFF seconds) before it is given up
+DOWNLOAD_TIMEOUT = float(os.environ.get("SISANT_DOWNLOAD_TIMEOUT", 60))
+DOWNLOAD_RETRIES = int(os.environ.get("SISANT_DOWNLOAD_RETRIES", 4))
+DOWNLOAD_BACKOFF = float(os.environ.get("SISANT_DOWNLOAD_BACKOFF", 2))
+
+# how often (in seconds) the background refresher checks the source for a new file
+REFRESH_INTERVAL = int(os.environ.get("SISANT_REFRESH_INTERVAL", 12 * 60 * 60))
+
+# number of rows parsed and cleaned at a time (0 parses the whole file at once)
+CHUNKSIZE = int(os.environ.get("SISANT_CHUNKSIZE", 100_000))
+
+# parser used for the CSV file: "pyarrow" (multithreaded) or "c" (pandas' own parser)
+CSV_ENGINE = os.environ.get("SISANT_CSV_ENGINE", "pyarrow")
+
+# dataframe backend of the cleaning and aggregation stages: "pandas", or "polars" (lazy, needs the polars package)
+BACKEND = os.environ.get("SISANT_BACKEND", "pandas")
+
+# per-stage timing and memory spans, logged as JSON lines and shown in a sidebar panel ("1" turns them on)
+DIAGNOSTICS = os.environ.get("SISANT_DIAGNOSTICS", "0") == "1"
@@ -0,0 +1,63 @@
+### Count cube of the cleaned dataframe, behind the charts and metrics of the explanatory section
+import numpy as np
+import pandas as pd
+import registry
+
+# dimensions of the cube, besides the month of registration
+DIMENSIONS = ["MANUFACTURER", "TYPE_OF_ACTIVITY", "LEGAL_ENT", "STATUS", "TYPE_OF_USE"]
+
+
+# counting the aircraft of each combination of month and dimensions found in the data;
+# months are labelled by their last day, like resample("ME")
+def build(df):
+    month = (registry.reg_date(df).dt.normalize() + pd.offsets.MonthEnd(0)).rename("MONTH")
+    return (
+        df.groupby([month, *(df[column] for column in DIMENSIONS)], observed=True, dropna=False)
+        .size()
+        .rename("COUNT")
+        .reset_index()
+    )
+
+
+# cells matching all the given dimension values
+def select(cube, **where):
+    mask = np.ones(cube.shape[0], dtype=bool)
+    for column, value in where.items():
+        mask &= (cube[column] == value).to_numpy(dtype=bool)
+    return cube[mask]
+
+
+def months(cube):
+    dates = cube["MONTH"].dropna()
+    return pd.date_range(dates.min(), dates.max(), freq="ME", name="REG_DATE")
+
+
+# registrations per month, including the months without any
+def monthly(cube, **where):
+    cells = select(cube, **where)
+    return cells.groupby("MONTH")["COUNT"].sum().reindex(months(cube), fill_value=0)
+
+
+# registrations per month for each value of a dimension, as rows of a pivot
+def by_month(cube, column):
+    return (
+        cube.pivot_table(
+            index=column,
+            columns="MONTH",
+            values="COUNT",
+            aggfunc="sum",
+            observed=False,
+            fill_value=0,
+        )
+        .reindex(columns=months(cube), fill_value=0)
+        .astype(np.int64)
+    )
+
+
+# counts of each pair of values of two dimensions, in long form
+def crosstab(cube, index, columns):
+    return (
+        cube.groupby([index, columns], observed=True)["COUNT"]
+        .sum()
+        .reset_index()
+    )
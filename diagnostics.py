@@ -0,0 +1,115 @@
+### Spans around the pipeline stages and chart builds: wall time, rows in/out and memory delta
+# (off by default; when off, span() returns a shared object that does nothing)
+import collections
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import pyarrow as pa
+from config import DIAGNOSTICS
+
+logger = logging.getLogger("sisant.diagnostics")
+
+# last spans recorded, shown by the diagnostics panel
+SPANS = collections.deque(maxlen=1000)
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+# spans are logged as one JSON object per line on stderr, unless logging was configured elsewhere
+def enable(on=True):
+    global _enabled
+    _enabled = on
+    if on and not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+
+# resident memory of the process (Linux), None where /proc is not available
+def _rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return None
+
+
+def _count(rows):
+    return rows.shape[0] if hasattr(rows, "shape") else rows
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def rows(self, rows_out):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, name, rows_in=None, **fields):
+        self.name = name
+        self.rows_in = _count(rows_in)
+        self.rows_out = None
+        self.fields = fields
+
+    def rows(self, rows_out):
+        self.rows_out = _count(rows_out)
+
+    def __enter__(self):
+        self._rss = _rss()
+        self._arrow = pa.total_allocated_bytes()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        rss = _rss()
+        record = {
+            "span": self.name,
+            "at": round(time.time(), 3),
+            "thread": threading.current_thread().name,
+            "ms": round(seconds * 1000, 2),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "rss_delta_mb": round((rss - self._rss) / 2**20, 2) if rss and self._rss else None,
+            "arrow_delta_mb": round((pa.total_allocated_bytes() - self._arrow) / 2**20, 2),
+            **self.fields,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        SPANS.append(record)
+        logger.info(json.dumps(record, default=str))
+        return False
+
+
+# usage: with span("parse", rows_in=df) as s: ...; s.rows(result)
+def span(name, rows_in=None, **fields):
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, rows_in, **fields)
+
+
+def recent(n=100):
+    return list(SPANS)[-n:]
+
+
+if DIAGNOSTICS:
+    enable()
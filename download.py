@@ -0,0 +1,124 @@
+### Resilient download of the source file: timeouts, retries with backoff, compressed transfer and resumed ranges
+import logging
+import os
+import random
+import time
+import zlib
+from http.client import HTTPException, IncompleteRead
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from config import DOWNLOAD_BACKOFF, DOWNLOAD_RETRIES, DOWNLOAD_TIMEOUT
+
+logger = logging.getLogger("sisant.download")
+
+# validators sent back to the server so an unchanged file is not downloaded again
+VALIDATORS = {"ETag": "If-None-Match", "Last-Modified": "If-Modified-Since"}
+
+# answers of an overloaded or failing server, worth another attempt (anything else, like a 404, fails right away)
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# errors of a download that failed (connection, timeout, HTTP status, truncated or corrupt body)
+ERRORS = (OSError, HTTPException, zlib.error)
+
+# longest wait between two attempts, whatever the backoff or the Retry-After header say
+MAX_DELAY = 60
+
+
+def _decoder(encoding):
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        # 32 + MAX_WBITS accepts both the gzip and the zlib header
+        return zlib.decompressobj(32 + zlib.MAX_WBITS)
+    return None
+
+
+# one request; `state` keeps what is needed to resume the file if the transfer breaks half-way
+def _attempt(url, path, headers, timeout, blocksize, state):
+    request = Request(url)
+    for name, value in (headers or {}).items():
+        request.add_header(VALIDATORS[name], value)
+
+    # only a file received without compression can be resumed: its size on disk is the offset in the body,
+    # and If-Range makes the server send the whole file again if it changed in the meantime
+    offset = os.path.getsize(path) if state.get("resume") and os.path.exists(path) else 0
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+        request.add_header("If-Range", state["resume"])
+    else:
+        request.add_header("Accept-Encoding", "gzip, deflate")
+
+    with urlopen(request, timeout=timeout) as response:
+        validators = {name: response.headers[name] for name in VALIDATORS if response.headers.get(name)}
+        encoding = response.headers.get("Content-Encoding", "identity").lower()
+        decoder = _decoder(encoding)
+        append = offset and response.status == 206
+        state["resume"] = None
+        if encoding == "identity":
+            state["resume"] = validators.get("ETag") or validators.get("Last-Modified")
+        expected = response.headers.get("Content-Length")
+
+        received = 0
+        with open(path, "ab" if append else "wb") as f:
+            while block := response.read(blocksize):
+                received += len(block)
+                f.write(decoder.decompress(block) if decoder else block)
+            if decoder:
+                f.write(decoder.flush())
+
+        if expected is not None and received < int(expected):
+            raise IncompleteRead(b"", int(expected) - received)
+        if decoder and not decoder.eof:
+            raise IncompleteRead(b"")
+    return path, validators
+
+
+def _delay(attempt, backoff, error):
+    delay = backoff * 2**attempt * random.uniform(0.5, 1)
+    retry_after = error.headers.get("Retry-After") if isinstance(error, HTTPError) and error.headers else None
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, int(retry_after))
+    return min(delay, MAX_DELAY)
+
+
+# downloading the file to disk block by block, or returning None if the server reports that it did not change;
+# failed attempts are retried with exponential backoff, resuming the transfer where possible, and the last error
+# is raised once the retries are exhausted
+def fetch(
+    url,
+    path,
+    headers=None,
+    timeout=DOWNLOAD_TIMEOUT,
+    retries=DOWNLOAD_RETRIES,
+    backoff=DOWNLOAD_BACKOFF,
+    blocksize=1 << 20,
+):
+    state = {}
+    for attempt in range(retries + 1):
+        try:
+            return _attempt(url, path, headers, timeout, blocksize, state)
+        except HTTPError as e:
+            if e.code == 304:
+                return None, headers
+            # the partial file no longer fits the one on the server
+            if e.code == 416:
+                state["resume"] = None
+            elif e.code not in RETRY_STATUS:
+                raise
+            error = e
+        except ERRORS as e:
+            error = e
+
+        if attempt == retries:
+            raise error
+        delay = _delay(attempt, backoff, error)
+        logger.warning(
+            "download of %s failed (%s: %s), attempt %d of %d, retrying in %.1fs%s",
+            url,
+            type(error).__name__,
+            error,
+            attempt + 1,
+            retries + 1,
+            delay,
+            f" from byte {os.path.getsize(path)}" if state.get("resume") and os.path.exists(path) else "",
+        )
+        time.sleep(delay)
@@ -0,0 +1,304 @@
+### Plotly figures of the explanatory section, built once per data version and language
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.subplots as sp
+
+TITLE_FONT = dict(color="rgb(150,150,150)", family="Roboto", size=24)
+
+# registry of the figures, filled by the @figure decorator; each one is called as func(data, lang)
+FIGURES = {}
+
+
+def figure(func):
+    FIGURES[func.__name__] = func
+    return func
+
+
+# registrations per month
+@figure
+def monthly_registers(data, lang):
+    # aggregating data by month
+    agg_data = data["monthly"]
+
+    # creating line plot
+    fig = px.line(
+        agg_data,
+        x="REG_DATE",
+        y="COUNT",
+        title=None,
+        labels={"REG_DATE": "", "COUNT": "new registers"},
+    )
+
+    # adding a customized title
+    fig.add_annotation(
+        xref="paper",
+        yref="paper",
+        x=0,
+        y=1.1,
+        text="Compliance with the system has increased over the time",
+        showarrow=False,
+        font=TITLE_FONT,
+    )
+
+    return fig
+
+
+# share of the registrations that are up to date
+@figure
+def status_gauge(data, lang):
+    kpi = data["metrics"]
+
+    fig = go.Figure()
+
+    # creating the gauge plot
+    fig.add_trace(
+        go.Indicator(
+            mode="gauge+number",
+            value=kpi.ok_share,
+            number=dict(suffix="%"),
+            title=None,
+            gauge=dict(axis=dict(range=[0, 100], ticksuffix="%")),
+        )
+    )
+
+    # adding a customized title
+    fig.add_annotation(
+        xref="paper",
+        yref="paper",
+        x=0,
+        y=1.2,
+        text="Active drones are in the majority",
+        showarrow=False,
+        font=TITLE_FONT,
+    )
+
+    return fig
+
+
+# share of the aircraft in basic operations
+@figure
+def use_indicator(data, lang):
+    # calculate the value counts for each type of use
+    value_counts = data.counts("TYPE_OF_USE")
+
+    # creating an indicator chart
+    fig = go.Figure(
+        go.Indicator(
+            mode="number",
+            title=dict(text="Currently,"),
+            value=value_counts.values[0] / value_counts.sum() * 100,
+            number=dict(suffix="%", font=dict(family="Open Sans", size=96)),
+            domain=dict(x=[0, 1], y=[0.6, 1]),
+        )
+    )
+
+    # adding text to the chart
+    fig.add_annotation(
+        xref="paper",
+        yref="paper",
+        xanchor="center",
+        yanchor="middle",
+        x=0.5,
+        y=0.5,
+        text="of the aircrafts are in basic operations<br><span style='color:gray'>(up to 25 kg, operated within line of sight and below 400 ft).</span>",
+        font=dict(color="white", size=20, family="Open Sans"),
+        showarrow=False,
+    )
+
+    # adding more text to the chart
+    fig.add_annotation(
+        xref="paper",
+        yref="paper",
+        xanchor="center",
+        yanchor="middle",
+        x=0.5,
+        y=0.01,
+        text=f"<span style='color:gray'>There are only</span><br><br><span style='font-size:48px'>{value_counts.values[1]}</span><br>UAVs registered for advanced operations.",
+        font=dict(color="white", size=20, family="Open Sans"),
+        showarrow=False,
+    )
+
+    # setting the chart's background to transparent
+    fig.update_layout(dict(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)"))
+
+    return fig
+
+
+# activities of individuals and companies
+@figure
+def activity_histogram(data, lang):
+    # create the histogram plot
+    fig = px.histogram(
+        data["activity_by_entity"],
+        y="TYPE_OF_ACTIVITY",
+        x="COUNT",
+        histfunc="sum",
+        color="LEGAL_ENT",
+        category_orders={
+            "TYPE_OF_ACTIVITY": data.counts("TYPE_OF_ACTIVITY").iloc[:10].index
+        },
+        height=500,
+    )
+
+    # setting histogram plot attributes
+    fig.update_layout(
+        legend=dict(
+            title=None,
+            xanchor="right",
+            yanchor="bottom",
+            x=0.92,
+            y=0.05,
+        ),
+        xaxis=dict(title=None),
+        yaxis=dict(title=None),
+    )
+
+    fig.add_annotation(
+        xref="paper",
+        yref="paper",
+        x=0,
+        y=1.15,
+        text="Recreational drones are in the majority",
+        showarrow=False,
+        font=TITLE_FONT,
+    )
+
+    fig.add_annotation(
+        xref="paper",
+        yref="paper",
+        x=0,
+        y=1.08,
+        text="and they are the favorite of the individuals.",
+        showarrow=False,
+        font=dict(color="white", size=16, family="Open Sans"),
+    )
+
+    return fig
+
+
+# registrations per month of the main manufacturers
+@figure
+def manufacturer_timeline(data, lang):
+    # Group by MANUFACTURER and use pd.Grouper to group by month, then unstack to pivot the data
+    manuf_count = data["manufacturer_by_month"]
+
+    top10_manuf = data.counts("MANUFACTURER").index[:12].drop(["custom", "others"])
+
+    fig = go.Figure()
+
+    for act in top10_manuf:
+        fig.add_trace(
+            go.Scatter(
+                x=manuf_count.loc[act].index, y=manuf_count.loc[act], name=act, mode="lines"
+            )
+        )
+
+    fig.add_annotation(
+        text="Although DJI UAV always represented a large part of the new <br>registrations in the system, other manufacturers sometimes cause <br> some spikes in the number of registrations.",
+        align="left",
+        xref="paper",
+        yref="paper",
+        x=0,
+        y=1.3,
+        showarrow=False,
+        font=dict(color="rgb(150,150,150)", family="Roboto", size=20),
+    )
+
+    return fig
+
+
+# registrations per month of each activity
+@figure
+def activity_timeline(data, lang):
+    # Group by TYPE_OF_ACTIVITY and use pd.Grouper to group by month, then unstack to pivot the data
+    act_count = data["activity_by_month"]
+
+    top10_act = data.counts("TYPE_OF_ACTIVITY").index
+
+    fig = go.Figure()
+
+    for act in top10_act:
+        fig.add_trace(go.Scatter(x=act_count.loc[act].index, y=act_count.loc[act], name=act, mode="lines"))
+
+    fig.add_annotation(
+        text="""Recreation”, “photo & filming”, and “engineering” had the<br>most registrations over time. Recently, there was a surge in<br>UAV registrations for “publicity”""",
+        align="left",
+        xref="paper",
+        yref="paper",
+        x=0,
+        y=1.3,
+        showarrow=False,
+        font=dict(color="rgb(150,150,150)", family="Roboto", size=20),
+    )
+
+    return fig
+
+
+# main manufacturers of individuals and companies
+@figure
+def manufacturer_by_entity(data, lang):
+    # counting the manufacturers for each LEGAL_ENT
+    ind_counts = data.counts("MANUFACTURER", LEGAL_ENT="individual")
+    co_counts = data.counts("MANUFACTURER", LEGAL_ENT="company")
+
+    # creating figure and subplots
+    fig = sp.make_subplots(
+        rows=1, 
+        cols=2, 
+        #subplot_titles=("individuals", "companies"), 
+        shared_yaxes=True
+    )
+
+    # creating the first histogram plot (individuals)
+    fig.add_trace(
+        go.Bar(
+            name="individuals",
+            x=ind_counts.iloc[:7].index.drop("custom"),
+            y=ind_counts.iloc[:7],
+            # marker_color="lightskyblue",
+            text=ind_counts.iloc[:7],
+        ),
+        row=1,
+        col=1,
+    )
+
+    # creating the second histogram plot (companies)
+    fig.add_trace(
+        go.Bar(
+            name="companies",
+            x=co_counts.iloc[:7].index.drop("others"),
+            y=co_counts.iloc[:7],
+            # marker_color="lightgreen",
+            text=co_counts.iloc[:7],
+        ),
+        row=1,
+        col=2,
+    )
+
+    # updating layout and axis labels
+    fig.update_layout(
+        legend=dict(
+            orientation="h",
+            xref="container",
+            xanchor="center",
+            yref="container",
+            yanchor="bottom",
+            x=0.5,
+            y=0,
+        ),
+        yaxis=dict(title=None),
+        yaxis2=dict(title=None),
+    )
+
+    fig.add_annotation(
+        text="""Distribution of aircraft manufacturer according to<br>the nature of the operators""",
+        align="left",
+        xref="paper",
+        yref="paper",
+        x=0,
+        y=1.3,
+        showarrow=False,
+        font=TITLE_FONT,
+    )
+
+    return fig
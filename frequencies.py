@@ -0,0 +1,47 @@
+### Frequency tables of the categorical columns, computed once per column and data version
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# memoized value_counts() of the categorical columns of one dataframe, counted from the category codes;
+# hits and misses are kept to check that the sections reuse the tables
+class Frequencies:
+    def __init__(self, df):
+        self.df = df
+        self.hits = 0
+        self.misses = 0
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    # same result as df.loc[<rows matching where>, column].value_counts(); each caller gets a shallow copy of
+    # the cached table, so a session that changes it does not change it for the others
+    def __call__(self, column, **where):
+        key = (column, tuple(sorted(where.items())))
+        with self._lock:
+            if key in self._tables:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._tables[key] = self._count(column, where)
+            return self._tables[key].copy(deep=False)
+
+    def _count(self, column, where):
+        values = self.df[column]
+        codes = values.cat.codes.to_numpy()
+        keep = codes >= 0
+        for other, value in where.items():
+            categories = self.df[other].cat.categories
+            code = categories.get_loc(value) if value in categories else -2
+            keep &= self.df[other].cat.codes.to_numpy() == code
+
+        categories = values.cat.categories
+        counts = np.bincount(codes[keep], minlength=len(categories))
+        index = pd.CategoricalIndex(
+            categories, categories=categories, ordered=values.cat.ordered, name=column
+        )
+        return pd.Series(counts, index=index, name="count").sort_values(ascending=False, kind="stable")
+
+    def info(self):
+        return {"tables": len(self._tables), "hits": self.hits, "misses": self.misses}
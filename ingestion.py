@@ -0,0 +1,190 @@
+### Downloading and parsing the SISANT data
+import logging
+import os
+
+import backends
+import download
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import preprocessing
+import snapshot
+from config import CHUNKSIZE, CSV_ENGINE, SNAPSHOT_DIR, SNAPSHOT_MAX_AGE
+from diagnostics import span
+
+logger = logging.getLogger("sisant.ingestion")
+
+# types of the features read from the file, the ones with few distinct values are parsed straight into categories
+SCHEMA = {
+    "AIRCRAFT_ID": pa.string(),
+    "EXPIRATION_DATE": pa.timestamp("us"),
+    "OPERATOR": pa.string(),
+    "CPF_CNPJ": pa.string(),
+    "TYPE_OF_USE": pa.dictionary(pa.int32(), pa.string()),
+    "MANUFACTURER": pa.dictionary(pa.int32(), pa.string()),
+    "MODEL": pa.string(),
+    "TYPE_OF_ACTIVITY": pa.dictionary(pa.int32(), pa.string()),
+}
+
+DTYPES = {
+    "AIRCRAFT_ID": "str",
+    "OPERATOR": "str",
+    "CPF_CNPJ": "str",
+    "TYPE_OF_USE": "category",
+    "MANUFACTURER": "category",
+    "MODEL": "str",
+    "TYPE_OF_ACTIVITY": "category",
+}
+
+# the values pandas reads as missing, so both parsers drop the same rows
+NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# approximate size in bytes of a line of the file, used to turn a number of rows into a block size
+ROW_SIZE = 128
+
+
+def _arrow_options(chunksize=None):
+    read_options = pacsv.ReadOptions(
+        skip_rows=2,
+        column_names=preprocessing.COLUMNS,
+        block_size=chunksize * ROW_SIZE if chunksize else None,
+    )
+    parse_options = pacsv.ParseOptions(delimiter=";")
+    convert_options = pacsv.ConvertOptions(
+        include_columns=preprocessing.FEATURES,
+        column_types=SCHEMA,
+        timestamp_parsers=["%d/%m/%Y"],
+        null_values=NA_VALUES,
+        strings_can_be_null=True,
+    )
+    return dict(
+        read_options=read_options,
+        parse_options=parse_options,
+        convert_options=convert_options,
+    )
+
+
+def _stream_arrow(source, chunksize):
+    with pacsv.open_csv(source, **_arrow_options(chunksize)) as reader:
+        for batch in reader:
+            yield batch.to_pandas()
+
+
+# parsing only the used features of the file, or an iterator over chunks of about `chunksize` rows
+def parse_csv(source, chunksize=None, engine=CSV_ENGINE):
+    if engine == "pyarrow":
+        if chunksize:
+            return _stream_arrow(source, chunksize)
+        return pacsv.read_csv(source, **_arrow_options()).to_pandas()
+
+    return pd.read_csv(
+        source,
+        delimiter=";",
+        skiprows=2,
+        header=None,
+        names=preprocessing.COLUMNS,
+        usecols=preprocessing.FEATURES,
+        dtype=DTYPES,
+        parse_dates=["EXPIRATION_DATE"],
+        date_format="%d/%m/%Y",
+        chunksize=chunksize,
+    )
+
+
+def load_snapshot(version):
+    with span("load_snapshot", version=version) as s:
+        stats = snapshot.load_meta(version)["stats"]
+        # the status is updated to the current date, as the snapshot may be a few days old
+        clean = preprocessing.add_status(snapshot.load_clean(version))
+        raw = snapshot.load_raw(version)
+        s.rows(clean)
+    return version, raw, clean, stats
+
+
+# loading the raw and cleaned dataframes, reusing the on-disk snapshot whenever possible
+# the data version joins the content hash of the file to the version of the cleaning stages
+def data_version(path):
+    return f"{snapshot.content_hash(path)}-{preprocessing.CLEANING_VERSION}"
+
+
+# snapshots cleaned by an older version of the stages are neither served nor used as incremental base
+def is_current(version):
+    return version is not None and version.endswith(f"-{preprocessing.CLEANING_VERSION}")
+
+
+# when the source cannot be downloaded, the last good snapshot is served instead (unless `fallback` is off);
+# a caller that already holds the `current` version gets None if the source still matches it, instead of a reload
+def load_data(url, max_age=SNAPSHOT_MAX_AGE, incremental=True, chunksize=CHUNKSIZE, fallback=True, current=None):
+    # a recent snapshot is served without touching the network
+    prev = snapshot.latest_version()
+    if not is_current(prev):
+        prev = None
+    if prev is not None and snapshot.age(prev) < max_age:
+        return None if prev == current else load_snapshot(prev)
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    headers = snapshot.load_meta(prev).get("headers") if prev is not None else None
+    try:
+        with span("download", url=url):
+            path, headers = download.fetch(url, os.path.join(SNAPSHOT_DIR, "SISANT.csv.part"), headers)
+    except download.ERRORS:
+        if prev is None or not fallback:
+            raise
+        logger.warning("could not download %s, serving the snapshot %s", url, prev, exc_info=True)
+        return load_snapshot(prev)
+
+    # the server answered 304 Not Modified
+    if path is None:
+        snapshot.mark_checked(prev, headers)
+        return None if prev == current else load_snapshot(prev)
+
+    try:
+        # the file did not change since the last snapshot, so no parsing or cleaning is needed
+        version = data_version(path)
+        if snapshot.exists(version):
+            snapshot.mark_checked(version, headers)
+            return None if version == current else load_snapshot(version)
+
+        prev_rows = prev_hashes = None
+        if incremental and prev is not None:
+            prev_hashes = snapshot.load_hashes(prev)
+            prev_rows = snapshot.load_rows(prev) if prev_hashes is not None else None
+
+        chunks = parse_csv(path, chunksize or None)
+        if not chunksize:
+            chunks = [chunks]
+
+        fingerprints = preprocessing.name_fingerprints()
+        names = snapshot.load_names(fingerprints)
+
+        backend = backends.get()
+        if backend.name == "pandas":
+            with span("parse_and_clean", version=version) as s:
+                rows, hashes, stats = preprocessing.clean_chunks(
+                    snapshot.write_raw(version, chunks), prev_rows, prev_hashes, names
+                )
+                s.rows(rows)
+            with span("finalize", rows_in=rows) as s:
+                clean = preprocessing.finalize(rows)
+                s.rows(clean)
+        else:
+            # the other backends clean the whole raw frame in one query, without the incremental row stage
+            rows = hashes = None
+            with span("parse", version=version):
+                for _ in snapshot.write_raw(version, chunks):
+                    pass
+            with span("clean", version=version, backend=backend.name) as s:
+                clean, stats = backend.clean(snapshot.load_raw(version), names=names)
+                s.rows(clean)
+        with span("save_snapshot", version=version):
+            snapshot.save(version, rows, clean, hashes, stats, headers)
+            snapshot.save_names(names, fingerprints)
+            # the previous snapshot is kept until the next file, as sessions may still be reading it
+            snapshot.prune({version, prev})
+    finally:
+        os.remove(path)
+
+    return version, snapshot.load_raw(version), clean, stats
@@ -0,0 +1,53 @@
+### Registration metrics (KPIs) computed in one vectorized pass over REG_DATE and STATUS
+from dataclasses import dataclass
+
+import numpy as np
+
+# 1970-01-01, day zero of datetime64, was a Thursday
+EPOCH_WEEKDAY = 3
+
+
+@dataclass(frozen=True)
+class Metrics:
+    total: int
+    this_week: int
+    last_six_months: int
+    inactive: int
+    renew: int
+    ok: int
+
+    # share of the registers that are up to date, in %
+    @property
+    def ok_share(self):
+        return round(self.ok / self.total * 100, ndigits=1) if self.total else 0.0
+
+
+# "this week" is the last weekly bin of the data (weeks ending on Sunday, like resample("W")),
+# "last six months" are the six full months before the month of the latest register
+def compute(reg_date, status):
+    days = reg_date.to_numpy(dtype="datetime64[D]")
+    dated = ~np.isnat(days)
+
+    day = days.view(np.int64)
+    month = days.astype("datetime64[M]").view(np.int64)
+    this_week = last_six_months = 0
+    if dated.any():
+        last_day = day[dated].max()
+        week_end = last_day + 6 - (last_day + EPOCH_WEEKDAY) % 7
+        last_month = month[dated].max()
+        this_week = int(np.count_nonzero(dated & (day > week_end - 7)))
+        last_six_months = int(
+            np.count_nonzero(dated & (month >= last_month - 6) & (month < last_month))
+        )
+
+    codes = status.cat.codes.to_numpy()
+    categories = status.cat.categories
+    counts = dict(zip(categories, np.bincount(codes[codes >= 0], minlength=len(categories))))
+    return Metrics(
+        total=int(reg_date.shape[0]),
+        this_week=this_week,
+        last_six_months=last_six_months,
+        inactive=int(counts.get("inactive", 0)),
+        renew=int(counts.get("renew", 0)),
+        ok=int(counts.get("ok", 0)),
+    )
@@ -0,0 +1,200 @@
+### Named stages computed once per data version
+import io
+import threading
+
+import backends
+import cube as cubes
+import figures
+import metrics as kpis
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import preprocessing
+import registry
+import renders
+import snapshot
+import wordcloud as wc
+from diagnostics import span
+from frequencies import Frequencies
+from PIL import Image
+from wordcloud import WordCloud
+
+WORDCLOUD_MASK = "img/brazil_mask.png"
+WORDCLOUD_PARAMS = dict(
+    width=1200,
+    height=600,
+    relative_scaling=0.4,
+    max_words=2000,
+    min_word_length=3,
+    colormap="tab10",
+)
+
+# registry of the stages, filled by the @stage decorator
+STAGES = {}
+
+# pandas 3 always copies on write; on pandas 2 it has to be turned on, so the shallow copies below never share writes
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+def stage(func):
+    STAGES[func.__name__] = func
+    return func
+
+
+# frames are handed out as shallow copies: with copy-on-write they share the data of the cached frame (nothing is copied),
+# but a session that modifies its copy (new columns, assignments) never changes what the other sessions see
+def _shared(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    return value
+
+
+# holds one version of the data and the results of the stages already computed for it,
+# so a rerun that only changes the presentation (language, expanders) just reads them back
+class Pipeline:
+    def __init__(self, version, raw, clean, stats, as_of=None):
+        self.version = version
+        self._raw = raw
+        self._clean = clean
+        self.stats = stats
+        # date the STATUS of the clean frame refers to
+        self.as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+        # value_counts() of the categorical columns, e.g. data.counts("MANUFACTURER", LEGAL_ENT="company")
+        self.counts = Frequencies(clean)
+        self._results = {}
+        self._figures = {}
+        self._lock = threading.RLock()
+
+    # the frames of the snapshot, shared by every session and never modified after loading
+    @property
+    def raw(self):
+        return _shared(self._raw)
+
+    @property
+    def clean(self):
+        return _shared(self._clean)
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._results:
+                with span(f"stage:{name}", rows_in=self._clean, version=self.version):
+                    self._results[name] = STAGES[name](self)
+            return _shared(self._results[name])
+
+    # plotly figure of a section, built once for each language; a new data version gets a new Pipeline,
+    # so the figures are only rebuilt when the snapshot changes. The spec of the figure is kept and every
+    # caller gets a new figure from it, so a session that updates its figure does not change the others';
+    # the spec was validated when the figure was built, so it is not validated again (ten times faster)
+    def figure(self, name, lang):
+        with self._lock:
+            if (name, lang) not in self._figures:
+                with span(f"figure:{name}", lang=lang, version=self.version):
+                    self._figures[name, lang] = figures.FIGURES[name](self, lang).to_dict()
+            return go.Figure(self._figures[name, lang], _validate=False)
+
+    def computed(self):
+        return list(self._results)
+
+
+def _info(df):
+    buffer = io.StringIO()
+    df.info(buf=buffer)
+    return buffer.getvalue()
+
+
+# raw dataframe without the NAs
+@stage
+def raw(data):
+    return preprocessing.drop_missing(data.raw)
+
+
+@stage
+def raw_info(data):
+    return _info(data["raw"])
+
+
+@stage
+def clean_info(data):
+    return _info(data.clean)
+
+
+# the cleaned frame as shown in the page (ID codes as index, with 'REG_DATE'), built once for all sessions;
+# apart from these two, its columns are the ones of the compact frame, not copies
+@stage
+def clean_view(data):
+    return registry.expand(data.clean)
+
+
+# memory_usage(deep=True) of each column of the cleaned frame
+@stage
+def memory(data):
+    return registry.memory_budget(data.clean)
+
+
+# count cube over month, manufacturer, activity, legal entity, status and type of use;
+# it depends on the status date too, so it is saved once per version and day (the cubes of past days are removed)
+@stage
+def cube(data):
+    name = f"cube-{data.as_of:%Y%m%d}"
+    counts = snapshot.load_derived(data.version, name)
+    if counts is None:
+        counts = cubes.build(data.clean)
+        snapshot.save_derived(data.version, name, counts)
+        snapshot.prune_derived(data.version, "cube-", name)
+    return counts
+
+
+# aggregating data by month
+@stage
+def monthly(data):
+    return cubes.monthly(data["cube"]).rename("COUNT").reset_index()
+
+
+# registers this week, in the last six months and in total, and the number of aircraft in each status
+@stage
+def metrics(data):
+    return kpis.compute(registry.reg_date(data.clean), data.clean["STATUS"])
+
+
+# number of registrations of each manufacturer per month
+@stage
+def manufacturer_by_month(data):
+    return backends.get().by_month(data["cube"], "MANUFACTURER")
+
+
+# number of registrations of each activity per month
+@stage
+def activity_by_month(data):
+    return backends.get().by_month(data["cube"], "TYPE_OF_ACTIVITY")
+
+
+# activities counted separately for individuals and companies
+@stage
+def activity_by_entity(data):
+    return cubes.crosstab(data["cube"], "TYPE_OF_ACTIVITY", "LEGAL_ENT")
+
+
+def _render_wordcloud(frequencies):
+    mask = np.array(Image.open(WORDCLOUD_MASK))
+    image = WordCloud(mask=mask, **WORDCLOUD_PARAMS).generate_from_frequencies(frequencies).to_image()
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# PNG of the manufacturers word cloud, drawn again only when the frequencies, mask or parameters change
+@stage
+def wordcloud(data):
+    frequencies = {
+        name: int(count)
+        for name, count in data.counts("MANUFACTURER").drop(labels=["custom", "others"]).items()
+    }
+    key = renders.render_key(
+        "wordcloud",
+        frequencies,
+        snapshot.content_hash(WORDCLOUD_MASK),
+        WORDCLOUD_PARAMS,
+        wc.__version__,
+    )
+    return renders.cached_png(key, lambda: _render_wordcloud(frequencies), "wordcloud")
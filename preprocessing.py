@@ -0,0 +1,460 @@
+### Pre-processing of the SISANT dataframe
+import hashlib
+import json
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import registry
+from diagnostics import span
+from pandas.api.types import union_categoricals
+
+# version of the cleaning stages, part of the data version so snapshots cleaned by older code are not reused
+# (to be increased whenever the output of clean_rows or of the standardize functions changes)
+CLEANING_VERSION = 5
+
+# names given to the columns of the SISANT.csv file
+COLUMNS = [
+    "AIRCRAFT_ID",
+    "EXPIRATION_DATE",
+    "OPERATOR",
+    "CPF_CNPJ",
+    "TYPE_OF_USE",
+    "MANUFACTURER",
+    "MODEL",
+    "SERIAL_NUMBER",
+    "MAX_WEIGHT_TAKEOFF",
+    "TYPE_OF_ACTIVITY",
+]
+
+# features used in the analysis ('SERIAL_NUMBER' and 'MAX_WEIGHT_TAKEOFF' are not even read from the file)
+FEATURES = [
+    "AIRCRAFT_ID",
+    "EXPIRATION_DATE",
+    "OPERATOR",
+    "CPF_CNPJ",
+    "TYPE_OF_USE",
+    "MANUFACTURER",
+    "MODEL",
+    "TYPE_OF_ACTIVITY",
+]
+
+# features of the cleaned frame, in order
+CLEAN_COLUMNS = [
+    "ID_PREFIX",
+    "ID_NUM",
+    "EXPIRATION_DATE",
+    "OPERATOR",
+    "TYPE_OF_USE",
+    "MANUFACTURER",
+    "MODEL",
+    "TYPE_OF_ACTIVITY",
+    "STATUS",
+    "LEGAL_ENT",
+    "ENT_NUM",
+    "ENT_CHECK",
+]
+
+# reasons why an ID code does not comply to the patterns set in the metadata (code 0 is a valid ID)
+ID_PROBLEMS = ["valid", "wrong prefix", "wrong length", "non-digit characters"]
+
+# features kept as categories while the cleaned chunks are accumulated
+COMPACT = ["TYPE_OF_USE", "MANUFACTURER", "TYPE_OF_ACTIVITY", "LEGAL_ENT", "ENT_CHECK"]
+
+# weights of the two check digits of the CPF and CNPJ numbers
+CPF_WEIGHTS = (np.arange(10, 1, -1), np.arange(11, 1, -1))
+CNPJ_WEIGHTS = (
+    np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]),
+    np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]),
+)
+
+# prefixes and punctuation of the 'CPF_CNPJ' formats, removed as plain substrings (much faster than a regex)
+CPF_CNPJ_MARKS = ["CNPJ:", "CPF:", ".", "-", "/", "*"]
+
+# the dictionary was created based on the most common values, however, given the high amount of unique values, lesser expressed and unknown manufacturers were grouped in the 'others' category
+man_map = {
+    "autelrobotics": "autel",
+    "c-fly": "cfly|c-fly",
+    "custom": "fabrica|aeromodelo|propria|própria|proprio|próprio|caseiro|montado|artesanal|constru",
+    "dji": "dji|mavic|phanton|phantom",
+    "flyingcircus": "circus",
+    "geprc": "gepr",
+    "highgreat": "highgreat",
+    "horus": "horus",
+    "hubsan": "hubsan|hubsen",
+    "lumasky": "lumasky",
+    "kfplan": "kfp",
+    "nuvemuav": "nuvem",
+    "others": "outro",
+    "parrot": "parrot",
+    "phoenixmodel": "phoenix",
+    "santiago-cintra": "santiago|cintra",
+    "sensefly": "sensefly",
+    "speedbird-aero": "speedbird",
+    "crostars": "crostar",
+    "shantou": "shantou",
+    "sjrc": "sjrc|srjc",
+    "visuo": "visuo",
+    "x-fly": "xfly|x-fly",
+    "xiaomi": "xiaomi|fimi|xiomi",
+    "xmobots": "xmobots",
+    "zll": "zll|sg906",
+}
+
+act_map = {
+    "education": "treinamento|educa|ensin|pesquis",
+    "engineering": "pulveriz|aeroagr|agricultura|levantamento|fotograme|prospec|topografia|minera|capta|avalia|mapea|geoproc|engenharia|energia|solar|ambiental|constru|obras|industria|arquitetura|meioambiente",
+    "photo&film": "fotografia|cinema|inspe|vídeo|video|fotos|jornal|filma|maker|audit|monit|perícia|audiovisu|vistoria|imagens|turismo|youtube|imobili|imóveis",
+    "logistics": "transport|carga|delivery",
+    "publicity": "publicid|letreir|show|marketing|demonstr|eventos|comercial",
+    "recreative": "recreativo",
+    "safety": "seguran|fiscaliza|reporta|vigi|policia|bombeiro|defesa|combate|emergencia|infraestrutura",
+}
+
+
+# dropping NAs
+def drop_missing(df):
+    return df.dropna()
+
+
+# checking the ID codes against the pattern ^(PR|PP|PS)-\d{9}$ with columnar string operations,
+# returning the code of the first problem found in each one
+def id_problems(ids):
+    prefix = ids.str[:3].isin(["PR-", "PP-", "PS-"]).to_numpy(dtype=bool)
+    length = (ids.str.len() == 12).to_numpy(dtype=bool)
+    # isdecimal() alone also accepts non-ASCII digits, which the integer encoding of the IDs would rewrite
+    number = ids.str[3:]
+    digits = (number.str.isdecimal() & number.str.isascii()).to_numpy(dtype=bool)
+    return np.select([~prefix, ~length, ~digits], [1, 2, 3], 0).astype(np.int8)
+
+
+# removing the ID codes that do not comply to the patterns set in the metadata
+def validate_ids(df):
+    df = df[id_problems(df["AIRCRAFT_ID"]) == 0]
+
+    # setting index:
+    df = df.set_index(df["AIRCRAFT_ID"])
+    df = df.drop(("AIRCRAFT_ID"), axis=1)
+    return df
+
+
+# sorting the expiration dates according to register status (register ok, renew or inactive) on the `as_of` date:
+# an expired register can still be renewed for six months, after that it becomes inactive
+def reg_status(dates, as_of=None):
+    as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+    dates = dates.to_numpy()
+    status = np.select(
+        [dates < (as_of - pd.DateOffset(months=6)).to_datetime64(), dates < as_of.to_datetime64()],
+        [0, 2],
+        1,
+    )
+    return pd.Categorical.from_codes(status, ["inactive", "ok", "renew"])
+
+
+# creating the 'STATUS' feature, which depends on the current date
+def add_status(df, as_of=None):
+    df["STATUS"] = reg_status(df["EXPIRATION_DATE"], as_of)
+    return df
+
+
+# checking the two mod-11 check digits of each number, written with as many digits as the weights require;
+# numbers of a single repeated digit (such as 000.000.000-00) pass the check, but are never issued
+def check_digits(numbers, weights):
+    width = len(weights[1]) + 1
+    digits = numbers[:, None] // 10 ** np.arange(width - 1, -1, -1) % 10
+    valid = ~(digits == digits[:, :1]).all(axis=1)
+    for w in weights:
+        remainder = (digits[:, : len(w)] * w).sum(axis=1) % 11
+        valid &= digits[:, len(w)] == np.where(remainder < 2, 0, 11 - remainder)
+    return valid
+
+
+# splitting the 'CPF_CNPJ' feature into 'LEGAL_ENT' and 'ENT_NUM' (an integer key) and checking its digits:
+# 'ENT_CHECK' is 'masked' for the CPFs distributed in suppressed form, otherwise 'valid' or 'invalid'
+def split_cpf_cnpj(df):
+    # removing whitespaces from the 'CPF_CNPJ'
+    cpf_cnpj = df["CPF_CNPJ"].str.replace(" ", "")
+    individual = cpf_cnpj.str.startswith("CPF").to_numpy(dtype=bool)
+
+    digits = cpf_cnpj
+    for mark in CPF_CNPJ_MARKS:
+        digits = digits.str.replace(mark, "", regex=False)
+    # the few values in other formats still go through the regex
+    unusual = ~(digits.str.isdecimal() & digits.str.isascii()) & (digits != "")
+    if unusual.any():
+        digits = digits.mask(unusual, digits[unusual].str.replace(r"\D", "", regex=True))
+
+    n_digits = digits.str.len().to_numpy()
+    numbers = digits.where((n_digits > 0) & (n_digits <= 18)).astype("Int64")
+
+    values = numbers.fillna(0).to_numpy(dtype=np.int64)
+    valid = np.where(
+        individual,
+        (n_digits == 11) & check_digits(values, CPF_WEIGHTS),
+        (n_digits == 14) & check_digits(values, CNPJ_WEIGHTS),
+    )
+    masked = cpf_cnpj.str.contains("*", regex=False).to_numpy(dtype=bool)
+
+    df["LEGAL_ENT"] = pd.Categorical.from_codes(individual.astype(np.int8), ["company", "individual"])
+    df["ENT_NUM"] = numbers
+    df["ENT_CHECK"] = pd.Categorical.from_codes(
+        np.select([masked, valid], [1, 2], 0), ["invalid", "masked", "valid"]
+    )
+
+    # dropping CPF_CNPJ
+    df = df.drop(("CPF_CNPJ"), axis=1)
+    return df
+
+
+# compiling a map into a single regex, with one alternative per standardized name tried in the order of the map,
+# so one match tells which entry of the map catches the value first
+@lru_cache(maxsize=None)
+def _compile_names(items):
+    alternatives = "|".join(
+        f"(?=.*?(?:{bad_names}))(?P<n{i}>)" for i, (_, bad_names) in enumerate(items)
+    )
+    regex = re.compile(f"^(?:{alternatives})", re.DOTALL)
+
+    # the map used to be applied entry by entry, with the later entries checked against the name already replaced,
+    # so each entry resolves to the name it would end up with
+    resolved = []
+    for i, (fixed_name, _) in enumerate(items):
+        for later_name, later_names in items[i + 1 :]:
+            if re.search(later_names, fixed_name):
+                fixed_name = later_name
+        resolved.append(fixed_name)
+
+    def classify(value):
+        m = regex.match(value)
+        return resolved[int(m.lastgroup[1:])] if m else value
+
+    return classify
+
+
+def compile_names(namemap):
+    return _compile_names(tuple(namemap.items()))
+
+
+# applying `func` once per distinct value and mapping the results back through the categorical codes;
+# `lookup` keeps the results already known, so only values never seen before are passed to `func`
+def map_unique(series, func, lookup=None):
+    series = series.astype("category")
+    if lookup is None:
+        lookup = {}
+
+    values = []
+    for value in series.cat.categories:
+        if value not in lookup:
+            lookup[value] = func(value)
+        values.append(lookup[value])
+
+    categories = pd.Index(values, dtype="str").unique()
+    mapping = categories.get_indexer(values)
+    codes = series.cat.codes.to_numpy()
+    return pd.Series(
+        pd.Categorical.from_codes(np.where(codes >= 0, mapping[codes], -1), categories),
+        index=series.index,
+    )
+
+
+# creating function so that, given a dataframe column and a map, the names are replaced by standardized names
+def fix_names(column, namemap, df):
+    df[column] = map_unique(df[column], compile_names(namemap))
+
+
+def _standardize_manufacturer(name):
+    return compile_names(man_map)(name.lower().replace(" ", ""))
+
+
+def _standardize_activity(name):
+    return compile_names(act_map)(name.replace(" ", "").lower())
+
+
+# maps used for each feature, a lookup built with an older version of a map is not reused
+NAME_MAPS = {"MANUFACTURER": man_map, "TYPE_OF_ACTIVITY": act_map}
+
+# standardized name of a raw value of each feature
+STANDARDIZE = {"MANUFACTURER": _standardize_manufacturer, "TYPE_OF_ACTIVITY": _standardize_activity}
+
+
+# the fingerprint covers the map and CLEANING_VERSION (raised whenever the standardize functions change too),
+# so names standardized by older code are not reused
+def name_fingerprints():
+    return {
+        column: hashlib.sha256(json.dumps([CLEANING_VERSION, namemap]).encode()).hexdigest()[:16]
+        for column, namemap in NAME_MAPS.items()
+    }
+
+
+# standardizing the free text features, reusing (and filling) the raw to standardized `names` lookup of each feature
+def normalize_names(df, names=None):
+    names = {} if names is None else names
+
+    df["TYPE_OF_USE"] = map_unique(
+        df["TYPE_OF_USE"], lambda x: "basic" if x == "Básico" else "advanced"
+    )
+
+    # transforming the feature with the manufacturers' names (lowercase and without whitespaces)
+    df["MANUFACTURER"] = map_unique(
+        df["MANUFACTURER"], STANDARDIZE["MANUFACTURER"], names.setdefault("MANUFACTURER", {})
+    )
+
+    df["TYPE_OF_ACTIVITY"] = map_unique(
+        df["TYPE_OF_ACTIVITY"], STANDARDIZE["TYPE_OF_ACTIVITY"], names.setdefault("TYPE_OF_ACTIVITY", {})
+    )
+    return df
+
+
+# stages that only depend on the row itself, so they can be run over any subset of registrations
+def clean_rows(df, names=None):
+    for name, func in [
+        ("validate_ids", validate_ids),
+        ("split_cpf_cnpj", split_cpf_cnpj),
+        ("normalize_names", lambda df: normalize_names(df, names)),
+    ]:
+        with span(name, rows_in=df) as s:
+            df = func(df)
+            s.rows(df)
+    return df
+
+
+def _as_category(series):
+    series = series.astype("category").cat.remove_unused_categories()
+    return series.cat.reorder_categories(series.cat.categories.sort_values())
+
+
+# reclassifying the activities out of the top 8 into 'others'
+def collapse_activities(activity, n=8):
+    activity = activity.astype("category")
+    codes = pd.Series(activity.cat.codes)
+
+    # counting the codes keeps the order of first appearance for ties, just like counting the names
+    top = codes.value_counts().head(n).index
+    names = activity.cat.categories.where(
+        np.isin(np.arange(len(activity.cat.categories)), top), "others"
+    )
+    categories = names.unique().sort_values()
+    return pd.Series(
+        pd.Categorical.from_codes(categories.get_indexer(names)[codes], categories),
+        index=activity.index,
+    )
+
+
+# stages that depend on the whole dataframe (or on the current date)
+def finalize(rows, as_of=None):
+    df = rows.copy()
+    df = add_status(df, as_of)
+
+    # reclassifying more specific activities into 'other' and converting the feature dtype
+    df["TYPE_OF_ACTIVITY"] = collapse_activities(df["TYPE_OF_ACTIVITY"])
+
+    for column in ["TYPE_OF_USE", "MANUFACTURER", "LEGAL_ENT", "ENT_CHECK"]:
+        df[column] = _as_category(df[column])
+
+    # IDs split into prefix code and number, dictionary-encoded text and no 'REG_DATE' (see registry.py)
+    df = registry.compact(df)
+
+    # keeping the original order of the features
+    return df[CLEAN_COLUMNS]
+
+
+# a hash of each registration, used to find the ones that changed since the previous file
+def hash_rows(df):
+    return pd.util.hash_pandas_object(df.set_index("AIRCRAFT_ID"), index=True).to_numpy()
+
+
+def _isin_sorted(values, sorted_values):
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    pos = np.searchsorted(sorted_values, values).clip(max=len(sorted_values) - 1)
+    return sorted_values[pos] == values
+
+
+def _compact(df):
+    for column in COMPACT:
+        df[column] = df[column].astype("category")
+    return df
+
+
+# concatenating the cleaned chunks, where pd.concat would turn categories with different values back into strings
+def _concat(parts):
+    df = pd.concat([part.drop(COMPACT, axis=1) for part in parts])
+    for column in COMPACT:
+        df[column] = union_categoricals([part[column] for part in parts], sort_categories=True)
+    return df[parts[0].columns]
+
+
+# cleaning one chunk of the file, reusing the previous row stage for the registrations that did not change
+def _clean_chunk(df, prev_rows=None, prev_hashes=None, names=None):
+    hashes = hash_rows(df)
+    if prev_hashes is None:
+        return clean_rows(df, names), hashes, len(df)
+
+    changed = ~_isin_sorted(hashes, prev_hashes)
+    ids = df["AIRCRAFT_ID"]
+
+    # unchanged registrations are taken from the previous row stage (invalid IDs are not found there)
+    pos = prev_rows.index.get_indexer(ids[~changed])
+    kept = prev_rows.iloc[pos[pos >= 0]]
+    fresh = clean_rows(df[changed], names)
+
+    # restoring the order of the file
+    rows = pd.concat([kept, fresh])
+    pos = rows.index.get_indexer(ids)
+    return rows.iloc[pos[pos >= 0]], hashes, int(changed.sum())
+
+
+# cleaning the file chunk by chunk, so only one chunk of raw rows is in memory at a time
+def clean_chunks(chunks, prev_rows=None, prev_hashes=None, names=None):
+    if prev_hashes is not None:
+        prev_hashes = np.sort(prev_hashes)
+
+    parts, raw_ids, ids, problems, hashes = [], [], [], [], []
+    n_changed = 0
+    for chunk in chunks:
+        df = drop_missing(chunk)
+
+        # only hashes of the IDs are kept, to count the duplicates at the end
+        raw_ids.append(pd.util.hash_array(df["AIRCRAFT_ID"].to_numpy()))
+
+        # removing whitespaces and duplicates
+        df["AIRCRAFT_ID"] = df["AIRCRAFT_ID"].str.replace(" ", "")
+        df = df.drop_duplicates(subset=["AIRCRAFT_ID"], keep="last")
+        ids.append(pd.util.hash_array(df["AIRCRAFT_ID"].to_numpy()))
+        problems.append(id_problems(df["AIRCRAFT_ID"]))
+
+        rows, chunk_hashes, changed = _clean_chunk(df, prev_rows, prev_hashes, names)
+        parts.append(_compact(rows))
+        hashes.append(chunk_hashes)
+        n_changed += changed
+
+    # removing the duplicates found across different chunks
+    rows = _concat(parts)
+    rows = rows[~rows.index.duplicated(keep="last")]
+
+    ids = pd.Index(np.concatenate(ids))
+    last = ~ids.duplicated(keep="last")
+    hashes = np.concatenate(hashes)[last]
+    problems = np.bincount(np.concatenate(problems)[last], minlength=len(ID_PROBLEMS))
+
+    stats = {
+        "duplicated": int(pd.Index(np.concatenate(raw_ids)).duplicated(keep=False).sum()),
+        "invalid": int(problems[1:].sum()),
+        "invalid_reasons": {
+            reason: int(count) for reason, count in zip(ID_PROBLEMS[1:], problems[1:])
+        },
+        "valid": rows.shape[0],
+        "ent_check": {
+            check: int(count) for check, count in rows["ENT_CHECK"].value_counts(sort=False).items()
+        },
+    }
+    if prev_hashes is not None:
+        stats["changed"] = n_changed
+    return rows, hashes, stats
+
+
+# running the whole cleaning chain over the raw dataframe
+def clean_data(raw):
+    rows, hashes, stats = clean_chunks([raw])
+    return rows, finalize(rows), stats
@@ -1,9 +1,266 @@
-import subprocess
+### Headless profiling of the app: cProfile and tracemalloc per page section, compared with a baseline
+#
+# usage: python profiling.py [--out profile.json] [--dump DIR] [--baseline PATH] [--save-baseline]
+#                            [--threshold 0.25] [--top 15]
+# the script runs under Streamlit's test runner (a cold run, a rerun and a language switch); every run is split
+# in sections at each st.header/st.subheader call, and each section gets its own profile and memory peak.
+# exits with status 1 when a section or a pipeline span got slower (or bigger) than the baseline allows
+import argparse
+import cProfile
+import json
+import logging
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
 
-# Run cProfile on your Python application
-cprofiler_command = "python -m cProfile -o app.prof app.py"
-subprocess.call(cprofiler_command, shell=True)
+import diagnostics
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
 
-# Run SnakeViz to visualize the profile data
-snakeviz_command = "snakeviz app.prof"
-subprocess.call(snakeviz_command, shell=True)
\ No newline at end of file
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+BASELINE = os.path.join(".bench", "profile-baseline.json")
+
+# runs of the script, in order, with the language selected in the sidebar
+RUNS = [
+    ("cold", ":flag-us: english"),
+    ("rerun", ":flag-us: english"),
+    ("pt-br", ":flag-br: pt-br"),
+]
+
+# differences below these are noise, whatever the relative change
+MIN_MS = 100
+MIN_MB = 5
+
+
+def _function(key):
+    path, line, name = key
+    if path == "~":
+        return name
+    for root in sys.path[1:]:
+        if root and path.startswith(root):
+            path = os.path.relpath(path, root)
+            break
+    return f"{path}:{line}({name})"
+
+
+# self time of the functions that spent the most in the section
+def _top(profile, n):
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:n]
+    return [
+        {
+            "function": _function(key),
+            "calls": calls,
+            "self_ms": round(tottime * 1000, 2),
+            "cumulative_ms": round(cumtime * 1000, 2),
+        }
+        for key, (_, calls, tottime, cumtime, _) in rows
+    ]
+
+
+# splits a run of the script into sections; the profilers are enabled from the script thread itself,
+# since cProfile only sees the thread it was enabled in
+class Sections:
+    def __init__(self, top=15, dump=None):
+        self.top = top
+        self.dump = dump
+        self.run = None
+        self.sections = []
+        self._current = None
+        self._lock = threading.Lock()
+
+    # the first call into app.py opens the "setup" section of the run
+    def _watch(self, frame, event, arg):
+        if threading.current_thread().name != "ScriptRunner.scriptThread":
+            sys.setprofile(None)
+        elif event == "call" and frame.f_code.co_filename == APP:
+            self.mark("setup")
+
+    def start(self, run):
+        self.run = run
+        self.sections = []
+        threading.setprofile(self._watch)
+
+    def stop(self):
+        threading.setprofile(None)
+        self._close()
+        return self.sections
+
+    def mark(self, label):
+        with self._lock:
+            self._close()
+            tracemalloc.reset_peak()
+            profile = cProfile.Profile()
+            self._current = (label, time.perf_counter(), tracemalloc.get_traced_memory()[0], profile)
+            profile.enable()
+
+    def _close(self):
+        if self._current is None:
+            return
+        label, start, memory, profile = self._current
+        self._current = None
+        profile.disable()
+        seconds = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+
+        if self.dump:
+            os.makedirs(self.dump, exist_ok=True)
+            profile.dump_stats(os.path.join(self.dump, f"{self.run}-{len(self.sections):02d}.prof"))
+        self.sections.append(
+            {
+                "section": label,
+                "ms": round(seconds * 1000, 1),
+                "peak_mb": round((peak - memory) / 2**20, 1),
+                "net_mb": round((current - memory) / 2**20, 1),
+                "top": _top(profile, self.top),
+            }
+        )
+
+
+# st.header and st.subheader open a new section before drawing the title
+def _patch_headers(sections):
+    originals = {name: getattr(st, name) for name in ["header", "subheader"]}
+
+    def patched(original):
+        def title(body, *args, **kwargs):
+            sections.mark(str(body).strip())
+            return original(body, *args, **kwargs)
+
+        return title
+
+    for name, original in originals.items():
+        setattr(st, name, patched(original))
+    return originals
+
+
+# total time of the pipeline spans (stages, chart builds, loading) recorded during a run
+def _spans(records):
+    spans = {}
+    for record in records:
+        total = spans.setdefault(record["span"], {"ms": 0.0, "count": 0})
+        total["ms"] = round(total["ms"] + record["ms"], 2)
+        total["count"] += 1
+    return spans
+
+
+def profile_app(top=15, dump=None):
+    # spans are collected in memory only, not logged
+    diagnostics.logger.addHandler(logging.NullHandler())
+    diagnostics.enable()
+    sections = Sections(top, dump)
+    originals = _patch_headers(sections)
+    tracemalloc.start()
+    runs = []
+    try:
+        at = AppTest.from_file(APP, default_timeout=600)
+        for name, lang in RUNS:
+            diagnostics.SPANS.clear()
+            sections.start(name)
+            start = time.perf_counter()
+            # the language radio exists once the script ran
+            if runs and at.sidebar.radio[0].value != lang:
+                at.sidebar.radio[0].set_value(lang)
+            at.run()
+            seconds = time.perf_counter() - start
+            runs.append(
+                {
+                    "run": name,
+                    "seconds": round(seconds, 3),
+                    "exceptions": [e.value for e in at.exception],
+                    "sections": sections.stop(),
+                    "spans": _spans(diagnostics.recent(len(diagnostics.SPANS))),
+                }
+            )
+    finally:
+        tracemalloc.stop()
+        for name, original in originals.items():
+            setattr(st, name, original)
+    return runs
+
+
+# every compared measure of a report, keyed by run and section (or span)
+def _measures(report):
+    measures = {}
+    for run in report["runs"]:
+        for section in run["sections"]:
+            key = f"{run['run']} / {section['section'][:40]}"
+            measures[f"{key} ms"] = (section["ms"], MIN_MS)
+            measures[f"{key} peak_mb"] = (section["peak_mb"], MIN_MB)
+        for name, total in run["spans"].items():
+            measures[f"{run['run']} / {name} ms"] = (total["ms"], MIN_MS)
+    return measures
+
+
+def regressions(report, baseline, threshold):
+    found = []
+    current = _measures(report)
+    for key, (before, noise) in _measures(baseline).items():
+        if key not in current:
+            continue
+        after = current[key][0]
+        if after - before > noise and after > before * (1 + threshold):
+            found.append(f"{key}: {before} -> {after} (+{(after / max(before, 1e-9) - 1) * 100:.0f}%)")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="headless profile of the Streamlit app, per page section")
+    parser.add_argument("--out", default=None, help="JSON file for the profile (default: stdout)")
+    parser.add_argument("--dump", default=None, help="directory for the .prof file of each section")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this profile as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative slowdown flagged as regression")
+    parser.add_argument("--top", type=int, default=15, help="functions listed per section")
+    args = parser.parse_args()
+
+    report = {
+        "created": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "streamlit": st.__version__,
+        },
+        "runs": profile_app(args.top, args.dump),
+    }
+
+    for run in report["runs"]:
+        print(f"{run['run']:<6} {run['seconds']:>8.3f}s  exceptions={len(run['exceptions'])}", file=sys.stderr)
+        for section in run["sections"]:
+            print(
+                f"       {section['ms']:>9.1f}ms  peak={section['peak_mb']:>7.1f}MB  {section['section'][:50]}",
+                file=sys.stderr,
+            )
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            f.write(output)
+        print(f"baseline saved to {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.threshold)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}", file=sys.stderr)
+
+    if any(run["exceptions"] for run in report["runs"]):
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+### Stale-while-revalidate refresh of the SISANT data in a background thread
+# (sessions are served the current pipeline while the next snapshot is downloaded and cleaned off the request path)
+import logging
+import threading
+import time
+
+import ingestion
+import pandas as pd
+import snapshot
+from config import REFRESH_INTERVAL, SNAPSHOT_MAX_AGE
+from diagnostics import span
+from pipeline import Pipeline
+
+logger = logging.getLogger("sisant.refresher")
+
+
+class Refresher:
+    def __init__(self, url, interval=REFRESH_INTERVAL):
+        self.url = url
+        self.interval = interval
+        # time of the last successful check of the source, and of the next one
+        self.last_refresh = None
+        self.next_refresh = None
+        self.last_error = None
+        self.refreshing = False
+        self._data = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # the pipeline of the latest snapshot; a rerun keeps the object it got, even if a newer one is swapped in meanwhile
+    def current(self):
+        if self._data is None:
+            self._load()
+        return self._data
+
+    # a current snapshot on disk is served right away, however old, and refreshed in the background;
+    # without one, the first session has to wait for the download
+    def _load(self):
+        with self._lock:
+            if self._data is not None:
+                return
+            version = snapshot.latest_version()
+            if ingestion.is_current(version):
+                self._swap(ingestion.load_snapshot(version))
+                self.last_refresh = time.time() - snapshot.age(version)
+            else:
+                self._swap(ingestion.load_data(self.url, max_age=SNAPSHOT_MAX_AGE))
+                self.last_refresh = time.time()
+            self.next_refresh = self.last_refresh + self.interval
+
+    def _swap(self, loaded):
+        self._data = Pipeline(*loaded)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sisant-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _wait(self):
+        if self.next_refresh is None:
+            return 0
+        return max(0, self.next_refresh - time.time())
+
+    def _run(self):
+        while not self._stop.wait(self._wait()):
+            self.refresh()
+
+    # checking the source (a conditional request, so an unchanged file is not downloaded again) and swapping in
+    # the new pipeline; the current one is kept, without reading its snapshot again, if the version and the
+    # status date did not change
+    def refresh(self):
+        self.refreshing = True
+        try:
+            current = self._data
+            with span("refresh", url=self.url):
+                loaded = ingestion.load_data(
+                    self.url, max_age=0, fallback=False, current=current.version if current is not None else None
+                )
+            if loaded is not None:
+                self._swap(loaded)
+            elif current.as_of != pd.Timestamp.today().normalize():
+                self._swap(ingestion.load_snapshot(current.version))
+            self.last_refresh = time.time()
+            self.last_error = None
+        except Exception as e:
+            # the previous snapshot is still served; the source is checked again after another interval
+            logger.exception("refresh of %s failed", self.url)
+            self.last_error = f"{type(e).__name__}: {e}"
+        finally:
+            self.next_refresh = time.time() + self.interval
+            self.refreshing = False
+
+    def status(self):
+        return {
+            "version": self._data.version if self._data is not None else None,
+            "interval": self.interval,
+            "last_refresh": self.last_refresh,
+            "next_refresh": self.next_refresh,
+            "refreshing": self.refreshing,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,70 @@
+### Compact in-memory representation of the cleaned registry
+# (the frame shared by all sessions keeps IDs as numbers, no derived dates and dictionary-encoded text)
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# prefixes of the valid ID codes, which match ^(PR|PP|PS)-\d{9}$
+ID_PREFIXES = ["PP", "PR", "PS"]
+
+# text features are stored as categories when they have at most this many distinct values per row
+DICTIONARY_MAX_RATIO = 0.5
+
+
+# splitting the (valid) ID codes into the code of the prefix and the 9-digit number, which fits in an int32
+def encode_ids(ids):
+    prefix = pd.Categorical(ids.str[:2], categories=ID_PREFIXES)
+    number = ids.str[3:].astype(np.int32)
+    return prefix, np.asarray(number)
+
+
+# the ID codes written as in the file, e.g. PR-012345678 (built with Arrow kernels, several times faster than .str)
+def aircraft_ids(df):
+    prefix = df["ID_PREFIX"]
+    prefixes = pc.take(pa.array(prefix.cat.categories.to_numpy(dtype=object)), prefix.cat.codes.to_numpy())
+    numbers = pc.utf8_lpad(pc.cast(pa.array(df["ID_NUM"].to_numpy()), pa.string()), 9, "0")
+    return pd.Index(pc.binary_join_element_wise(prefixes, numbers, "-"), dtype="str", name="AIRCRAFT_ID")
+
+
+# the registration date is always two years before the expiration date, so it is derived when needed
+def reg_date(df):
+    return (df["EXPIRATION_DATE"] - pd.DateOffset(years=2)).rename("REG_DATE")
+
+
+def dictionary_encode(series, max_ratio=DICTIONARY_MAX_RATIO):
+    if series.nunique() > max_ratio * len(series):
+        return series.astype("str")
+    return series.astype("category")
+
+
+# the compact frame, indexed by position, from the frame indexed by the ID codes
+def compact(df, text=("OPERATOR", "MODEL")):
+    prefix, number = encode_ids(df.index)
+    df = df.reset_index(drop=True)
+    df.insert(0, "ID_PREFIX", prefix)
+    df.insert(1, "ID_NUM", number)
+    for column in text:
+        df[column] = dictionary_encode(df[column])
+    return df
+
+
+# the frame as shown in the page: indexed by the ID codes and with the registration date
+def expand(df):
+    view = df.drop(["ID_PREFIX", "ID_NUM"], axis=1).set_index(aircraft_ids(df))
+    view.insert(view.columns.get_loc("STATUS") + 1, "REG_DATE", reg_date(df).to_numpy())
+    return view
+
+
+# memory_usage(deep=True) of each column (and the index), with its share of the frame
+def memory_budget(df):
+    usage = df.memory_usage(deep=True)
+    index_dtype = "range" if isinstance(df.index, pd.RangeIndex) else str(df.index.dtype)
+    return pd.DataFrame(
+        {
+            "dtype": [index_dtype, *df.dtypes.astype("str")],
+            "bytes": usage,
+            "bytes_per_row": (usage / max(len(df), 1)).round(2),
+            "share": (usage / usage.sum() * 100).round(1),
+        }
+    )
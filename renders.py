@@ -0,0 +1,52 @@
+### Rendered images cached on disk, keyed by a hash of everything they are drawn from
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from config import SNAPSHOT_DIR
+
+RENDER_DIR = os.path.join(SNAPSHOT_DIR, "renders")
+
+# files of the renders stored under the bare key
+LEGACY = re.compile(r"[0-9a-f]{32}\.png")
+
+
+# the key changes whenever any of the parts (data, parameters, file hashes, library versions) changes
+def render_key(*parts):
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+# PNG bytes of the render stored under the key, drawing (and storing) it only if missing;
+# a new render of `name` replaces the older ones, as their data is not served anymore
+def cached_png(key, render, name, root=RENDER_DIR):
+    path = os.path.join(root, f"{name}-{key}.png")
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    png = render()
+    os.makedirs(root, exist_ok=True)
+    # a temporary file of its own, as other processes may be drawing the same render
+    fd, tmp = tempfile.mkstemp(dir=root, prefix=f".{name}-{key}.", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(png)
+    os.replace(tmp, path)
+    prune(name, key, root)
+    return png
+
+
+# removing the renders of `name` other than the `keep` key (and those stored under the bare key, before the
+# renders were named)
+def prune(name, keep, root=RENDER_DIR):
+    for file in os.listdir(root):
+        named = file.startswith(f"{name}-") and file.endswith(".png")
+        if (named or LEGACY.fullmatch(file)) and file != f"{name}-{keep}.png":
+            try:
+                os.remove(os.path.join(root, file))
+            except FileNotFoundError:
+                pass
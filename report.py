@@ -0,0 +1,210 @@
+### Static HTML (and PNG) report of the analysis, generated without a browser session
+#
+# usage: python report.py [--out report] [--lang en pt-br] [--png] [--workers N] [--url URL]
+# the figures are rendered concurrently in a process pool; --png needs the optional kaleido package
+import argparse
+import html
+import importlib.util
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import assets
+import ingestion
+import text as txt
+from config import SISANT_URL
+from pipeline import Pipeline
+from plotly.offline import get_plotlyjs
+
+MARKED_JS = "https://cdn.jsdelivr.net/npm/marked/marked.min.js"
+
+# sections of the page, in order: markdown texts, images, figures and metric cards
+LAYOUT = [
+    ("title", txt.HEADER),
+    ("image", "drone.jpg"),
+    ("text", txt.INTRO1),
+    ("text", txt.INTRO2),
+    ("text", txt.INTRO3),
+    ("text", txt.INFO),
+    ("subheader", {"en": "Dataframe metadata", "pt-br": "Metadados do dataframe"}),
+    ("image", "features.jpg"),
+    ("text", txt.METADATA),
+    ("subheader", txt.DPP_SUBHEADER),
+    ("image", "aerial_farm.jpg"),
+    ("text", txt.DPP_MD1),
+    ("cleaning", None),
+    ("text", txt.DPP_MD2),
+    ("text", txt.DPP_MD3),
+    ("text", txt.DPP_MD4),
+    ("subheader", txt.EX_SUBHEADER),
+    ("image", "aerial_roof.jpg"),
+    ("text", txt.EX_MD1),
+    ("figure", "monthly_registers"),
+    ("metrics", ["this_week", "last_six_months", "total"]),
+    ("figure", "status_gauge"),
+    ("metrics", ["renew", "inactive"]),
+    ("text", txt.EX_MD2),
+    ("figure", "use_indicator"),
+    ("text", txt.EX_MD3),
+    ("figure", "activity_histogram"),
+    ("text", txt.EX_MD4),
+    ("wordcloud", None),
+    ("text", txt.EX_MD5),
+    ("text", txt.INFO2),
+    ("figure", "manufacturer_timeline"),
+    ("figure", "activity_timeline"),
+    ("figure", "manufacturer_by_entity"),
+]
+
+METRIC_LABELS = {
+    "this_week": "New registers this week:",
+    "last_six_months": "Registers last six months:",
+    "total": "Total registers:",
+    "renew": "Expiring drone licenses:",
+    "inactive": "Expired:",
+}
+
+STYLE = """body {max-width: 860px; margin: auto; padding: 1em; background: #0e1117; color: #fafafa;
+font-family: sans-serif} img {max-width: 100%} .center {text-align: center}
+.md {white-space: pre-wrap} .cards {display: flex; gap: 1em} .card {flex: 1; border: 1px solid #cccccc;
+border-radius: 0.5em; padding: 0.5em} .card b {display: block; font-size: 2em}"""
+
+# each worker loads the snapshot once and keeps its own pipeline
+_data = None
+
+
+def _init_worker(version):
+    global _data
+    _data = Pipeline(*ingestion.load_snapshot(version))
+
+
+def _render_figure(name, lang, png):
+    fig = _data.figure(name, lang)
+    div = fig.to_html(full_html=False, include_plotlyjs=False, div_id=f"{name}-{lang}")
+    return div, fig.to_image(format="png") if png else None
+
+
+def _write(path, content):
+    mode = "wb" if isinstance(content, bytes) else "w"
+    with open(path, mode) as f:
+        f.write(content)
+
+
+# markdown is rendered in the browser (marked.js); without it the text is shown as is
+def _markdown(text):
+    return f'<div class="md">{html.escape(text)}</div>' if text else ""
+
+
+def _cards(kpi, names):
+    cards = "".join(
+        f'<div class="card">{METRIC_LABELS[name]}<b>{getattr(kpi, name)}</b></div>'
+        for name in names
+    )
+    return f'<div class="cards">{cards}</div>'
+
+
+def _cleaning(stats):
+    return _markdown(
+        f"❌ Duplicated entries: {stats['duplicated']}\n"
+        f"❌ Invalid ID entries: **{stats['invalid']}**\n"
+        f"✔️ Valid entries in the dataframe: **{stats['valid']}**"
+    )
+
+
+def build_page(data, lang, divs):
+    body = []
+    for kind, item in LAYOUT:
+        if kind == "title":
+            body.append(f"<h1>{html.escape(item.get(lang))}</h1>")
+        elif kind == "subheader":
+            body.append(f"<h2>{html.escape(item.get(lang))}</h2>")
+        elif kind == "text":
+            body.append(_markdown(item.get(lang)))
+        elif kind == "image":
+            body.append(f'<p class="center"><img src="img/{item}"></p>')
+        elif kind == "figure":
+            body.append(divs[item, lang])
+        elif kind == "metrics":
+            body.append(_cards(data["metrics"], item))
+        elif kind == "cleaning":
+            body.append(_cleaning(data.stats))
+        elif kind == "wordcloud":
+            body.append('<p class="center"><img src="img/wordcloud.png" width="50%"></p>')
+
+    return f"""<!DOCTYPE html>
+<html lang="{lang}">
+<head>
+<meta charset="utf-8">
+<title>{html.escape(txt.HEADER.get(lang))}</title>
+<style>{STYLE}</style>
+<script src="plotly.min.js"></script>
+<script src="{MARKED_JS}"></script>
+</head>
+<body>
+{chr(10).join(body)}
+<p><small>Data version {data.version}</small></p>
+<script>
+if (window.marked) {{
+    for (const div of document.querySelectorAll(".md")) {{
+        div.innerHTML = marked.parse(div.textContent);
+        div.classList.remove("md");
+    }}
+}}
+</script>
+</body>
+</html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="static HTML report of the SISANT analysis")
+    parser.add_argument("--out", default="report", help="output directory")
+    parser.add_argument("--lang", nargs="+", default=["en", "pt-br"], choices=["en", "pt-br"])
+    parser.add_argument("--png", action="store_true", help="also export every figure as PNG (kaleido)")
+    parser.add_argument("--workers", type=int, default=None, help="size of the process pool")
+    parser.add_argument("--url", default=SISANT_URL)
+    args = parser.parse_args()
+
+    if args.png and importlib.util.find_spec("kaleido") is None:
+        parser.error("--png needs the kaleido package (pip install kaleido)")
+
+    start = time.perf_counter()
+    data = Pipeline(*ingestion.load_data(args.url))
+    # the cube is saved to the snapshot directory before the pool starts, so the workers read it back instead of
+    # all computing and writing the same file
+    data["cube"]
+    os.makedirs(os.path.join(args.out, "img"), exist_ok=True)
+    if args.png:
+        os.makedirs(os.path.join(args.out, "figures"), exist_ok=True)
+
+    # every (figure, language) pair and the word cloud are independent, so they are rendered in parallel:
+    # the figures in the pool, the word cloud (the most expensive one) here while the workers run
+    names = [item for kind, item in LAYOUT if kind == "figure"]
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(data.version,)) as pool:
+        jobs = {
+            (name, lang): pool.submit(_render_figure, name, lang, args.png)
+            for lang in args.lang
+            for name in names
+        }
+        wordcloud = data["wordcloud"]
+        divs = {}
+        for (name, lang), job in jobs.items():
+            divs[name, lang], png = job.result()
+            if png is not None:
+                _write(os.path.join(args.out, "figures", f"{name}-{lang}.png"), png)
+    _write(os.path.join(args.out, "img", "wordcloud.png"), wordcloud)
+
+    for name in ["drone.jpg", "features.jpg", "aerial_farm.jpg", "aerial_roof.jpg"]:
+        _write(os.path.join(args.out, "img", name), assets.image(name))
+    _write(os.path.join(args.out, "plotly.min.js"), get_plotlyjs())
+    for lang in args.lang:
+        _write(os.path.join(args.out, f"report-{lang}.html"), build_page(data, lang, divs))
+
+    print(
+        f"report of version {data.version} written to {args.out}/ "
+        f"({len(jobs)} figures, {time.perf_counter() - start:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
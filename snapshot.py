@@ -0,0 +1,239 @@
+### On-disk snapshots of the raw and cleaned SISANT dataframes
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config import SNAPSHOT_DIR
+
+LATEST = "LATEST"
+NAMES = "names.json"
+
+# directories of the snapshots (content hash and cleaning version), the only ones prune removes
+VERSION_PATTERN = re.compile(r"[0-9a-f]{16}-\d+")
+
+
+# the data version is the hash of the downloaded file, so identical files share the same snapshot
+def content_hash(path, blocksize=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(blocksize):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def snapshot_path(version, name, root=SNAPSHOT_DIR):
+    return os.path.join(root, version, name)
+
+
+# a temporary file of its own next to `path`, so writers in other processes (the app, the report workers)
+# never write to the same one
+def _temp_path(path):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    return tmp
+
+
+# writing to a temporary file first, so a crash never leaves half a snapshot behind
+def _atomic_write(path, write):
+    tmp = _temp_path(path)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+# writing the raw chunks to the snapshot while they are passed along to the cleaning
+def write_raw(version, chunks, root=SNAPSHOT_DIR):
+    os.makedirs(os.path.join(root, version), exist_ok=True)
+    path = snapshot_path(version, "raw.parquet", root)
+    tmp = _temp_path(path)
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(
+                chunk, schema=writer.schema if writer else None, preserve_index=False
+            )
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table)
+            yield chunk
+    except BaseException:
+        os.remove(tmp)
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp, path)
+
+
+# the row-level stage and the row hashes are kept next to the cleaned frame, so a later file only needs its changed rows cleaned
+# (a backend that cleans in one query has neither, and the next file is cleaned in full)
+def save(version, rows, clean, hashes, stats, headers=None, root=SNAPSHOT_DIR):
+    os.makedirs(os.path.join(root, version), exist_ok=True)
+    if rows is not None:
+        _atomic_write(
+            snapshot_path(version, "rows.parquet", root),
+            lambda path: rows.to_parquet(path),
+        )
+    _atomic_write(
+        snapshot_path(version, "clean.parquet", root),
+        lambda path: clean.to_parquet(path),
+    )
+    if hashes is not None:
+        _atomic_write(
+            snapshot_path(version, "hashes.npy", root),
+            lambda path: _write_npy(path, hashes),
+        )
+    now = time.time()
+    meta = {
+        "version": version,
+        "created": now,
+        "checked": now,
+        "stats": stats,
+        "headers": headers or {},
+    }
+    _write_meta(version, meta, root)
+    _set_latest(version, root)
+
+
+def _set_latest(version, root=SNAPSHOT_DIR):
+    _atomic_write(
+        os.path.join(root, LATEST),
+        lambda path: _write_text(path, version),
+    )
+
+
+def _write_meta(version, meta, root=SNAPSHOT_DIR):
+    _atomic_write(
+        snapshot_path(version, "meta.json", root),
+        lambda path: _write_json(path, meta),
+    )
+
+
+def _write_json(path, obj):
+    with open(path, "w") as f:
+        json.dump(obj, f)
+
+
+def _write_npy(path, array):
+    with open(path, "wb") as f:
+        np.save(f, array)
+
+
+def _write_text(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def exists(version, root=SNAPSHOT_DIR):
+    return os.path.exists(snapshot_path(version, "meta.json", root))
+
+
+def load_meta(version, root=SNAPSHOT_DIR):
+    with open(snapshot_path(version, "meta.json", root)) as f:
+        return json.load(f)
+
+
+def load_raw(version, root=SNAPSHOT_DIR):
+    return pd.read_parquet(snapshot_path(version, "raw.parquet", root))
+
+
+def load_rows(version, root=SNAPSHOT_DIR):
+    return pd.read_parquet(snapshot_path(version, "rows.parquet", root))
+
+
+def load_hashes(version, root=SNAPSHOT_DIR):
+    path = snapshot_path(version, "hashes.npy", root)
+    return np.load(path) if os.path.exists(path) else None
+
+
+def load_clean(version, root=SNAPSHOT_DIR):
+    return pd.read_parquet(snapshot_path(version, "clean.parquet", root))
+
+
+# frames derived from a snapshot (such as the count cube) are kept in its directory; None if not saved yet
+def load_derived(version, name, root=SNAPSHOT_DIR):
+    path = snapshot_path(version, f"{name}.parquet", root)
+    return pd.read_parquet(path) if os.path.exists(path) else None
+
+
+def save_derived(version, name, df, root=SNAPSHOT_DIR):
+    os.makedirs(os.path.join(root, version), exist_ok=True)
+    _atomic_write(
+        snapshot_path(version, f"{name}.parquet", root),
+        lambda path: df.to_parquet(path),
+    )
+
+
+# removing the frames of the snapshot whose name starts with `prefix`, except `keep` (e.g. the cubes of past days)
+def prune_derived(version, prefix, keep, root=SNAPSHOT_DIR):
+    for name in os.listdir(os.path.join(root, version)):
+        if name.startswith(prefix) and name.endswith(".parquet") and name != f"{keep}.parquet":
+            os.remove(snapshot_path(version, name, root))
+
+
+# removing every snapshot but the `keep` versions (the latest one and the base of the incremental update),
+# so the directory does not grow with each new file
+def prune(keep, root=SNAPSHOT_DIR):
+    for name in os.listdir(root):
+        if VERSION_PATTERN.fullmatch(name) and name not in keep:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+# version of the last saved snapshot, or None if there is none yet
+def latest_version(root=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(root, LATEST)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version if exists(version, root) else None
+
+
+# recording that the source was checked and still matches the snapshot
+def mark_checked(version, headers=None, root=SNAPSHOT_DIR):
+    meta = load_meta(version, root)
+    meta["checked"] = time.time()
+    if headers:
+        meta["headers"] = headers
+    _write_meta(version, meta, root)
+    _set_latest(version, root)
+
+
+# seconds since the snapshot was last checked against the source
+def age(version, root=SNAPSHOT_DIR):
+    return time.time() - load_meta(version, root)["checked"]
+
+
+# raw to standardized names lookup, shared by all versions; a feature whose map changed (different fingerprint) starts empty
+def load_names(fingerprints, root=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(root, NAMES)) as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        stored = {}
+    return {
+        column: stored[column]["values"]
+        for column, fingerprint in fingerprints.items()
+        if column in stored and stored[column]["fingerprint"] == fingerprint
+    }
+
+
+def save_names(names, fingerprints, root=SNAPSHOT_DIR):
+    os.makedirs(root, exist_ok=True)
+    stored = {
+        column: {"fingerprint": fingerprints[column], "values": values}
+        for column, values in names.items()
+    }
+    _atomic_write(os.path.join(root, NAMES), lambda path: _write_json(path, stored))
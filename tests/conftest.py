@@ -0,0 +1,96 @@
+### Shared fixtures: a scratch snapshot directory and the local stand-in for the ANAC server
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+sys.path.insert(0, ROOT)
+
+# relative, so each test gets its own snapshots in its working directory; short waits between retries
+os.environ["SISANT_SNAPSHOT_DIR"] = ".snapshots"
+os.environ["SISANT_DOWNLOAD_TIMEOUT"] = "10"
+os.environ["SISANT_DOWNLOAD_RETRIES"] = "3"
+os.environ["SISANT_DOWNLOAD_BACKOFF"] = "0.01"
+
+
+def fixture(name):
+    return os.path.join(FIXTURES, name)
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"the fake server did not start on port {port}")
+
+
+class Server:
+    def __init__(self, directory, options):
+        self.path = os.path.join(directory, "SISANT.csv")
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}/SISANT.csv"
+        self.options = options
+        self.process = None
+        self.files = 0
+
+    # replacing the served file; its mtime is moved a second forward each time, so its Last-Modified changes too
+    def serve(self, name):
+        shutil.copy(fixture(name), self.path)
+        self.files += 1
+        mtime = time.time() + self.files
+        os.utime(self.path, (mtime, mtime))
+        return self
+
+    def start(self):
+        command = [sys.executable, os.path.join(ROOT, "benchmarks", "fake_server.py"), self.path]
+        self.process = subprocess.Popen(
+            command + ["--port", str(self.port)] + self.options, stderr=subprocess.DEVNULL
+        )
+        _wait(self.port)
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+
+
+# serve("SISANT-v1.csv", "--fail", "2") starts a server with the fixture file and the failures to inject
+@pytest.fixture
+def serve(tmp_path):
+    servers = []
+
+    def start(name, *options):
+        directory = tmp_path / f"www{len(servers)}"
+        directory.mkdir()
+        server = Server(str(directory), list(options)).serve(name).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
@@ -0,0 +1,71 @@
+### Retries, resumed transfers and the last-good fallback, against the local stand-in server
+import logging
+
+import download
+import ingestion
+import pytest
+from conftest import fixture
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_compressed_transfer(serve, workdir):
+    server = serve("SISANT-v1.csv")
+    path, headers = download.fetch(server.url, str(workdir / "SISANT.csv"))
+
+    assert _read(path) == _read(fixture("SISANT-v1.csv"))
+    assert set(headers) == {"ETag", "Last-Modified"}
+
+
+def test_not_modified(serve, workdir):
+    server = serve("SISANT-v1.csv")
+    headers = download.fetch(server.url, str(workdir / "SISANT.csv"))[1]
+
+    assert download.fetch(server.url, str(workdir / "SISANT.csv"), headers) == (None, headers)
+
+
+def test_retries_after_server_errors(serve, workdir):
+    # the 503 answers ask for a second of Retry-After each
+    server = serve("SISANT-v1.csv", "--fail", "2")
+    path, _ = download.fetch(server.url, str(workdir / "SISANT.csv"))
+
+    assert _read(path) == _read(fixture("SISANT-v1.csv"))
+
+
+def test_gives_up_after_the_retries(serve, workdir):
+    server = serve("SISANT-v1.csv", "--fail", "10")
+
+    with pytest.raises(download.ERRORS):
+        download.fetch(server.url, str(workdir / "SISANT.csv"), retries=1)
+
+
+@pytest.mark.parametrize("options", [["--no-gzip"], []])
+def test_resumes_a_dropped_transfer(serve, workdir, caplog, options):
+    server = serve("SISANT-v1.csv", "--drop", "1", "--drop-at", "0.5", *options)
+    with caplog.at_level(logging.WARNING, logger="sisant.download"):
+        path, _ = download.fetch(server.url, str(workdir / "SISANT.csv"))
+
+    assert _read(path) == _read(fixture("SISANT-v1.csv"))
+    # only a file received without compression is resumed, a compressed one is downloaded again
+    resumed = [record for record in caplog.records if "from byte" in record.getMessage()]
+    assert len(resumed) == (1 if options else 0)
+
+
+def test_falls_back_to_the_last_snapshot(serve):
+    server = serve("SISANT-v1.csv")
+    version = ingestion.load_data(server.url, max_age=0)[0]
+    server.stop()
+
+    assert ingestion.load_data(server.url, max_age=0)[0] == version
+    with pytest.raises(download.ERRORS):
+        ingestion.load_data(server.url, max_age=0, fallback=False)
+
+
+def test_no_fallback_without_a_snapshot(serve):
+    server = serve("SISANT-v1.csv", "--fail", "10")
+
+    with pytest.raises(download.ERRORS):
+        ingestion.load_data(server.url, max_age=0)
@@ -0,0 +1,62 @@
+### Conditional requests and the incremental update, against the local stand-in server
+import ingestion
+import pandas as pd
+import preprocessing
+import snapshot
+from conftest import fixture
+
+
+def test_first_load_cleans_the_whole_file(serve):
+    server = serve("SISANT-v1.csv")
+    version, raw, clean, stats = ingestion.load_data(server.url, max_age=0)
+
+    assert snapshot.latest_version() == version
+    assert raw.shape[0] == 400
+    assert clean.shape[0] == stats["valid"]
+    assert "changed" not in stats
+
+
+def test_not_modified_marks_the_snapshot_checked(serve, monkeypatch):
+    server = serve("SISANT-v1.csv")
+    version = ingestion.load_data(server.url, max_age=0)[0]
+    headers = snapshot.load_meta(version)["headers"]
+    assert headers
+
+    checked = []
+    mark_checked = snapshot.mark_checked
+    monkeypatch.setattr(snapshot, "mark_checked", lambda *args: checked.append(args) or mark_checked(*args))
+    # nothing is parsed again: the answer is a 304
+    monkeypatch.setattr(ingestion, "parse_csv", None)
+
+    assert ingestion.load_data(server.url, max_age=0)[0] == version
+    assert checked == [(version, headers)]
+
+
+def test_not_modified_current_version_is_not_loaded_again(serve, monkeypatch):
+    server = serve("SISANT-v1.csv")
+    version = ingestion.load_data(server.url, max_age=0)[0]
+    monkeypatch.setattr(ingestion, "load_snapshot", None)
+
+    assert ingestion.load_data(server.url, max_age=0, current=version) is None
+
+
+def test_recent_snapshot_is_served_without_a_request(serve):
+    server = serve("SISANT-v1.csv")
+    version = ingestion.load_data(server.url, max_age=0)[0]
+    server.stop()
+
+    assert ingestion.load_data(server.url)[0] == version
+
+
+def test_incremental_update_equals_a_full_clean(serve):
+    server = serve("SISANT-v1.csv")
+    v1 = ingestion.load_data(server.url, max_age=0, chunksize=100)[0]
+    server.serve("SISANT-v2.csv")
+    v2, _, clean, stats = ingestion.load_data(server.url, max_age=0, chunksize=100)
+
+    assert v2 != v1
+    assert 0 < stats.pop("changed") < clean.shape[0]
+    _, full, full_stats = preprocessing.clean_data(ingestion.parse_csv(fixture("SISANT-v2.csv")))
+    pd.testing.assert_frame_equal(clean, full)
+    assert stats == full_stats
+    pd.testing.assert_frame_equal(snapshot.load_clean(v2), full)
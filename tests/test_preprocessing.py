@@ -0,0 +1,69 @@
+### Row-level cleaning stages on hand-checked values
+import numpy as np
+import pandas as pd
+import preprocessing
+import pytest
+
+AS_OF = pd.Timestamp("2026-10-17")
+
+
+def test_reg_status_boundaries():
+    dates = pd.Series(
+        [
+            AS_OF,
+            AS_OF - pd.Timedelta(days=1),
+            AS_OF - pd.DateOffset(months=6),
+            AS_OF - pd.DateOffset(months=6) - pd.Timedelta(days=1),
+        ]
+    )
+
+    status = preprocessing.reg_status(dates, AS_OF)
+
+    assert list(status) == ["ok", "renew", "renew", "inactive"]
+
+
+def test_name_fingerprints_follow_the_cleaning_version(monkeypatch):
+    before = preprocessing.name_fingerprints()
+    monkeypatch.setattr(preprocessing, "CLEANING_VERSION", preprocessing.CLEANING_VERSION + 1)
+
+    after = preprocessing.name_fingerprints()
+
+    assert all(after[column] != before[column] for column in preprocessing.NAME_MAPS)
+
+
+@pytest.mark.parametrize(
+    "number, weights, valid",
+    [
+        (52998224725, preprocessing.CPF_WEIGHTS, True),
+        (52998224724, preprocessing.CPF_WEIGHTS, False),
+        (1234567890, preprocessing.CPF_WEIGHTS, True),
+        (11222333000181, preprocessing.CNPJ_WEIGHTS, True),
+        (11222333000180, preprocessing.CNPJ_WEIGHTS, False),
+        # a single repeated digit passes the mod-11 check, but is never issued
+        (0, preprocessing.CPF_WEIGHTS, False),
+        (11111111111, preprocessing.CPF_WEIGHTS, False),
+        (0, preprocessing.CNPJ_WEIGHTS, False),
+    ],
+)
+def test_check_digits(number, weights, valid):
+    assert preprocessing.check_digits(np.array([number]), weights).tolist() == [valid]
+
+
+def test_split_cpf_cnpj():
+    values = [
+        "CPF: 529.982.247-25",
+        "CPF: 529.982.247-24",
+        "CPF: 012.345.678-90",
+        "CPF: 000.000.000-00",
+        "CPF: ***.982247-**",
+        "CNPJ: 11.222.333/0001-81",
+        "CNPJ: 11.222.333/0001-80",
+    ]
+    df = preprocessing.split_cpf_cnpj(pd.DataFrame({"CPF_CNPJ": pd.Series(values, dtype="str")}))
+
+    assert "CPF_CNPJ" not in df
+    assert list(df["LEGAL_ENT"]) == ["individual"] * 5 + ["company"] * 2
+    assert list(df["ENT_NUM"]) == [
+        52998224725, 52998224724, 1234567890, 0, 982247, 11222333000181, 11222333000180,
+    ]
+    assert list(df["ENT_CHECK"]) == ["valid", "invalid", "valid", "invalid", "masked", "valid", "invalid"]
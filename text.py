@@ -24,6 +24,11 @@ SB_MENU3 = {
     "pt-br": "[Análise explicativa](#explanatory-analysis)",
 }
 
+SB_REFRESH = {
+    "en": "Data checked at {last}, refreshed every {interval} h",
+    "pt-br": "Dados verificados em {last}, atualizados a cada {interval} h",
+}
+
 ## TITLE
 HEADER = {
     "en": "Charting trends in Brazilian unmanned aviation: ANAC's UAV Database",